@@ -0,0 +1,190 @@
+"""Headless benchmark of gpui (and DirectGui for comparison).
+Runs without a display, using an offscreen buffer and headless OpenGL (EGL).
+Each widget count is measured in a new process, results are printed as json.
+If the renderer can't run the gui shader (no GLSL or no non power of 2
+textures) nothing is drawn, so the gpui timings of rendered frames are left out.
+
+usage: python benchmark.py [--counts 1000 10000 50000] [--frames 100] [--pick-mode cpu] [--instanced] [--output results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+def get_rss():
+    """Returns the resident memory of this process in bytes (linux only, else 0)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+def init_panda():
+    from panda3d.core import load_prc_file_data
+    load_prc_file_data('', 'window-type offscreen')
+    load_prc_file_data('', 'load-display p3headlessgl')
+    load_prc_file_data('', 'audio-library-name null')
+    load_prc_file_data('', 'textures-power-2 None')
+    load_prc_file_data('', 'notify-level error')
+    load_prc_file_data('', 'default-directnotify-level error')
+    from direct.showbase.ShowBase import ShowBase
+    return ShowBase()
+
+def can_draw_gui(base):
+    """True if the renderer can run the gui shader"""
+    gsg=base.win.get_gsg()
+    return gsg.get_supports_glsl() and gsg.get_supports_tex_non_pow2()
+
+def time_it(function, repeat):
+    """Returns the mean time of function() in seconds"""
+    start=time.perf_counter()
+    for i in range(repeat):
+        function()
+    return (time.perf_counter()-start)/repeat
+
+def bench_gpui(count, frames, pick_mode='cpu', instanced=False):
+    base=init_panda()
+    import numpy as np
+    from gpui import Gui, Button, Dummy
+
+    columns=int(count**0.5)
+    result={'toolkit':'gpui', 'pick_mode':pick_mode, 'instanced':instanced,
+            'renderer':base.win.get_gsg().get_driver_renderer()}
+    draws=can_draw_gui(base)
+
+    rss_start=get_rss()
+    gui=Gui(pick_mode=pick_mode, instanced=instanced)
+    gui.make_group('bench')
+    root=Dummy(gui=gui, name='root')
+    start=time.perf_counter()
+    #full rows, then the rest in a shorter last row, exactly count widgets
+    rows, last_row=divmod(count, columns)
+    with gui.bulk():
+        buttons=Button.make_grid(gui=gui, columns=columns, rows=rows, spacing=(32, 32),
+                                 width=32, group='bench', parent='root',
+                                 on_click_cmd='pass')
+        buttons+=Button.make_grid(gui=gui, columns=last_row, rows=1, spacing=(32, 32), pos=(0, rows*32),
+                                  width=32, group='bench', parent='root',
+                                  on_click_cmd='pass')
+    result['construct_s']=time.perf_counter()-start
+    result['widgets']=len(buttons)
+    start=time.perf_counter()
+    gui.close_group('bench')
+    result['close_group_s']=time.perf_counter()-start
+    base.taskMgr.step()
+    group=gui.groups['bench']
+    vertex_bytes=sum(array.get_data_size_bytes() for array in group.vdata.get_arrays())
+    table_bytes=gui.pos_scale.data.nbytes+gui.clips.data.nbytes
+    result['gpu_bytes_per_widget']=(vertex_bytes+table_bytes)/result['widgets']
+    result['rss_bytes_per_widget']=(get_rss()-rss_start)/result['widgets']
+
+    #update() when nothing changed
+    def idle():
+        gui.update()
+        gui.update_stats()
+    result['update_idle_ms']=time_it(idle, frames)*1000.0
+    #update() after moving one widget
+    def move_one():
+        buttons[0].set_pos_delta(1, 0)
+        gui.update()
+        gui.update_stats()
+    result['update_move_one_ms']=time_it(move_one, frames)*1000.0
+    result['bytes_per_frame_move_one']=gui.stats.last_frame['uploaded_bytes']
+    #update() after moving the parent of all the widgets (like a drag)
+    def move_all():
+        root.set_pos_delta(1, 0)
+        gui.update()
+        gui.update_stats()
+    result['update_move_all_ms']=time_it(move_all, frames)*1000.0
+    result['bytes_per_frame_move_all']=gui.stats.last_frame['uploaded_bytes']
+    if draws:
+        #a full frame (update + render), nothing changed so the gui is not drawn
+        result['frame_ms']=time_it(base.taskMgr.step, frames)*1000.0
+        #a full frame where the gui is drawn again
+        def frame_move_one():
+            buttons[0].set_pos_delta(1, 0)
+            base.taskMgr.step()
+        result['frame_redraw_ms']=time_it(frame_move_one, frames)*1000.0
+
+    #picking
+    points=np.random.default_rng(0).uniform(0, 32*columns, (frames, 2))
+    point_iter=iter(points.tolist()*2)
+    #the first pick after moving updates the grid
+    start=time.perf_counter()
+    gui.pick_at(*next(point_iter))
+    result['pick_grid_update_ms']=(time.perf_counter()-start)*1000.0
+    result['pick_cpu_us']=time_it(lambda: gui.pick_at(*next(point_iter)), frames)*1000000.0
+    if pick_mode != 'cpu' and draws:
+        result['pick_gpu_ms']=time_it(gui._gpu_pick, max(1, frames//10))*1000.0
+    return result
+
+def bench_directgui(count, frames):
+    base=init_panda()
+    from direct.gui.DirectGui import DirectButton
+
+    columns=int(count**0.5)
+    result={'toolkit':'directgui',
+            'renderer':base.win.get_gsg().get_driver_renderer()}
+    rss_start=get_rss()
+    start=time.perf_counter()
+    buttons=[]
+    for i in range(count):
+        y, x=divmod(i, columns)
+        buttons.append(DirectButton(frameSize=(32, 0, 0, -32),
+                                    pos=(x*32, 0, -y*32),
+                                    scale=32,
+                                    parent=base.pixel2d))
+    result['construct_s']=time.perf_counter()-start
+    result['widgets']=len(buttons)
+    base.taskMgr.step()
+    result['rss_bytes_per_widget']=(get_rss()-rss_start)/result['widgets']
+    result['frame_ms']=time_it(base.taskMgr.step, frames)*1000.0
+    def move_all():
+        base.pixel2d.set_x(base.pixel2d.get_x()+1)
+        base.taskMgr.step()
+    result['frame_move_all_ms']=time_it(move_all, frames)*1000.0
+    return result
+
+def run_single(toolkit, count, frames, pick_mode, instanced):
+    if toolkit == 'gpui':
+        return bench_gpui(count, frames, pick_mode, instanced)
+    return bench_directgui(count, frames)
+
+def main():
+    parser=argparse.ArgumentParser(description='Headless gpui benchmark')
+    parser.add_argument('--counts', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--toolkits', nargs='+', default=['gpui', 'directgui'], choices=['gpui', 'directgui'])
+    parser.add_argument('--pick-mode', default='cpu', choices=['cpu', 'gpu', 'gpu_async'],
+                        help='pick_mode of the gui, the gpu modes render the gui twice each frame')
+    parser.add_argument('--instanced', action='store_true', help='draw the quads with hardware instancing')
+    parser.add_argument('--output', default=None, help='write the json results to this file')
+    parser.add_argument('--single', nargs=2, metavar=('TOOLKIT', 'COUNT'), help=argparse.SUPPRESS)
+    args=parser.parse_args()
+
+    if args.single:
+        result=run_single(args.single[0], int(args.single[1]), args.frames, args.pick_mode, args.instanced)
+        print(json.dumps(result))
+        return
+
+    results=[]
+    for toolkit in args.toolkits:
+        for count in args.counts:
+            #a new process for each run, so memory use is not shared
+            cmd=[sys.executable, os.path.abspath(__file__), '--single', toolkit, str(count), '--frames', str(args.frames),
+                 '--pick-mode', args.pick_mode]+(['--instanced'] if args.instanced else [])
+            out=subprocess.run(cmd, stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+            result=json.loads(out.strip().splitlines()[-1])
+            print(json.dumps(result), file=sys.stderr)
+            results.append(result)
+    report={'python':sys.version.split()[0], 'time':time.strftime('%Y-%m-%dT%H:%M:%S'), 'results':results}
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
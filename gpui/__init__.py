@@ -1,2 +1,4 @@
 from .gui import *
 from .widgets import *
+from .layout import *
+from .text import *
@@ -0,0 +1,401 @@
+import numpy as np
+from panda3d.core import *
+
+__all__=['QuadGroup', 'InstancedQuadGroup', 'get_quad_indices', 'SLICE_MODE']
+
+#quad mode of nine-slice quads, see shaders.widget
+SLICE_MODE=2
+
+#index arrays for GeomTriangles, by number of quads, shared by all groups
+_quad_indices={}
+
+def get_quad_indices(num_quads):
+    """Returns a (cached) GeomVertexArrayData with the indices
+    of 2 triangles for each of num_quads quads """
+    if num_quads not in _quad_indices:
+        #quad i is made from rows i*4+(0, 2, 1) and i*4+(2, 3, 1)
+        if num_quads*4 > 0xffff:
+            index_type=Geom.NT_uint32
+            dtype=np.uint32
+        else:
+            index_type=Geom.NT_uint16
+            dtype=np.uint16
+        pattern=np.array((0, 2, 1, 2, 3, 1), dtype=dtype)
+        first_rows=np.arange(num_quads, dtype=dtype)[:, np.newaxis]*4
+        tris=GeomTriangles(Geom.UHDynamic)
+        tris.set_index_type(index_type)
+        indices=tris.modify_vertices()
+        indices.set_num_rows(num_quads*6)
+        view=np.frombuffer(memoryview(indices), dtype=dtype)
+        view[:]=(first_rows+pattern).ravel()
+        del view
+        _quad_indices[num_quads]=tris.get_vertices()
+    return _quad_indices[num_quads]
+
+class QuadGroup:
+    """A group of quads that will be drawn as one geom.
+    Each quad takes a slot (4 rows in the vdata), quads are drawn in slot
+    order (no depth test), so new quads always take the slot after the last
+    used one and are drawn over the quads made before them.
+    Slots of removed quads are collapsed to zero-area, free slots at the
+    end are reused, the ones in between only go away with compact().
+    Once the geom is made, extra slots are reserved (as zero-area quads already
+    in the index buffer) so quads can be added without making a new geom
+    """
+    min_capacity=16
+    #vdata array with the quads and the number of its rows for each slot
+    quad_array=0
+    rows_per_slot=4
+    instanced=False
+
+    def __init__(self, name, vtx_format):
+        self.name=name
+        self.vdata=GeomVertexData('quad', vtx_format, Geom.UHDynamic)
+        #number of slots ever used (free or not)
+        self.num_slots=0
+        #free slots below num_slots
+        self.free_slots=set()
+        #slot -> id of the element that owns the quad
+        self.slot_owner={}
+        #number of slots that have rows in the vdata
+        self.capacity=0
+        #the primitive of the geom, None until make_geom() is called
+        self.tris=None
+        #column name -> first float of the column in a row
+        array_format=vtx_format.get_array(self.quad_array)
+        self.columns={}
+        for i in range(array_format.get_num_columns()):
+            column=array_format.get_column(i)
+            self.columns[column.get_name().get_name()]=column.get_start()//4
+        self.reset_writers()
+
+    def reset_writers(self):
+        self.vertex = GeomVertexWriter(self.vdata, 'vertex')
+        self.texcoord = GeomVertexWriter(self.vdata, 'texcoord')
+        self.offset_uv = GeomVertexWriter(self.vdata, 'offset_uv')
+        self.color_id = GeomVertexWriter(self.vdata, 'color_id')
+        self.slice = GeomVertexWriter(self.vdata, 'slice')
+        self.writers=(self.vertex, self.texcoord, self.offset_uv, self.color_id, self.slice)
+
+    def alloc_slot(self, id):
+        """Returns a slot for a new quad of the element with the given id,
+        and moves the writers to its first row """
+        slot=self.num_slots
+        self.num_slots+=1
+        if slot >= self.capacity:
+            if self.tris is None:
+                #rows are added by the writers
+                self.capacity=slot+1
+            else:
+                self.reserve(self.capacity*2)
+        self.slot_owner[slot]=id
+        for writer in self.writers:
+            writer.set_row(slot*self.rows_per_slot)
+        return slot
+
+    def alloc_slots(self, ids):
+        """Returns an array of slots for new quads, one for each id in ids """
+        num_quads=len(ids)
+        slots=np.arange(self.num_slots, self.num_slots+num_quads)
+        self.num_slots+=num_quads
+        if self.num_slots > self.capacity:
+            if self.tris is None:
+                self.capacity=self.num_slots
+            else:
+                self.reserve(self.get_capacity_for(self.num_slots))
+        self.slot_owner.update(zip(slots.tolist(), np.asarray(ids).tolist()))
+        return slots
+
+    def _get_num_rows(self):
+        return self.vdata.get_array(self.quad_array).get_num_rows()
+
+    def _set_num_rows(self, num_rows):
+        self.vdata.set_num_rows(num_rows)
+
+    def get_rows(self):
+        """Returns a numpy (float32) view of the vdata, one row per vertex,
+        the vdata is first made big enough to hold all the slots """
+        if self._get_num_rows() < self.capacity*self.rows_per_slot:
+            self._set_num_rows(self.capacity*self.rows_per_slot)
+            self.reset_writers()
+        rows=np.frombuffer(memoryview(self.vdata.modify_array(self.quad_array)), dtype=np.float32)
+        return rows.reshape(self._get_num_rows(), -1)
+
+    def write_quad(self, slot, color, size, pos, uv, hover_uv, click_uv, mode, border=(0, 0)):
+        """Writes one quad into the slot from alloc_slot() (where the writers are),
+        color is the id as a color with the id itself as w, see Gui.id_to_color()"""
+        size_x, size_y=size
+        if mode == SLICE_MODE:
+            #the shader finds the uv from the top left corner of the uv rect
+            uv=(uv[0], uv[3], uv[0], uv[3])
+        #geom tristrip cheat sheet:
+        #
+        #  0---2     3---1
+        #  |  /|     |  /|
+        #  | / |     | / |
+        #  |/  |     |/  |
+        #  1---3     2---0
+        #
+        # uv: uv=(0,0, 1,1)
+        #
+        #  [0][3]---[2][3]
+        #  |       /|
+        #  |      / |
+        #  |     /  |
+        #  |    /   |
+        #  |   /    |
+        #  |  /     |
+        #  | /      |
+        #  [0][1]---[2][1]
+
+        #vert 0
+        self.vertex.add_data4(pos[0], pos[1], mode, 1)
+        self.texcoord.add_data2(uv[0], uv[3])
+        self.offset_uv.add_data4(*hover_uv, *click_uv)
+        self.color_id.add_data4(*color)
+        self.slice.add_data4(border[0], border[1], size_x, size_y)
+        #vert 1
+        self.vertex.add_data4(pos[0], pos[1]+size_y, mode, 1)
+        self.texcoord.add_data2(uv[0], uv[1])
+        self.offset_uv.add_data4(*hover_uv, *click_uv)
+        self.color_id.add_data4(*color)
+        self.slice.add_data4(border[0], border[1], size_x, size_y)
+        #vert 2
+        self.vertex.add_data4(pos[0]+size_x, pos[1], mode, 1)
+        self.texcoord.add_data2(uv[2], uv[3])
+        self.offset_uv.add_data4(*hover_uv, *click_uv)
+        self.color_id.add_data4(*color)
+        self.slice.add_data4(border[0], border[1], size_x, size_y)
+        #vert 3
+        self.vertex.add_data4(pos[0]+size_x, pos[1]+size_y, mode, 1)
+        self.texcoord.add_data2(uv[2], uv[1])
+        self.offset_uv.add_data4(*hover_uv, *click_uv)
+        self.color_id.add_data4(*color)
+        self.slice.add_data4(border[0], border[1], size_x, size_y)
+
+    def write_quads(self, slots, ids, size, pos, uv, hover_uv, click_uv, mode=None, border=None):
+        """Writes quads into the vdata, all arguments are arrays with
+        one row per quad (size is (width, height)),
+        mode is the vertex.z of the quad (0 for widgets),
+        border is the (x, y) border of nine-slice quads """
+        num_quads=len(slots)
+        rows=self.get_rows()
+        quads=np.zeros((num_quads, 4, rows.shape[1]), dtype=np.float32)
+        #vertex order is the same as in Gui.add_quad()
+        corner_x=np.array((0.0, 0.0, 1.0, 1.0), dtype=np.float32)
+        corner_y=np.array((0.0, 1.0, 0.0, 1.0), dtype=np.float32)
+        c=self.columns['vertex']
+        quads[:, :, c]=pos[:, 0:1]+corner_x*size[:, 0:1]
+        quads[:, :, c+1]=pos[:, 1:2]+corner_y*size[:, 1:2]
+        if mode is not None:
+            quads[:, :, c+2]=mode[:, np.newaxis]
+        quads[:, :, c+3]=1.0
+        c=self.columns['texcoord']
+        if mode is not None:
+            #nine-slice quads have the top left corner of the uv rect on all vertices
+            corner_x=np.where((mode == SLICE_MODE)[:, np.newaxis], 0.0, corner_x)
+            corner_y=np.where((mode == SLICE_MODE)[:, np.newaxis], 0.0, corner_y)
+        quads[:, :, c]=np.where(corner_x, uv[:, 2:3], uv[:, 0:1])
+        quads[:, :, c+1]=np.where(corner_y, uv[:, 1:2], uv[:, 3:4])
+        c=self.columns['offset_uv']
+        quads[:, :, c:c+2]=hover_uv[:, np.newaxis, :]
+        quads[:, :, c+2:c+4]=click_uv[:, np.newaxis, :]
+        #color_id, the id as a rgb color and the id itself as w
+        c=self.columns['color_id']
+        quads[:, :, c]=((ids >> 16) & 255)[:, np.newaxis]/255.0
+        quads[:, :, c+1]=((ids >> 8) & 255)[:, np.newaxis]/255.0
+        quads[:, :, c+2]=(ids & 255)[:, np.newaxis]/255.0
+        quads[:, :, c+3]=ids[:, np.newaxis]
+        c=self.columns['slice']
+        if border is not None:
+            quads[:, :, c:c+2]=border[:, np.newaxis, :]
+        quads[:, :, c+2:c+4]=size[:, np.newaxis, :]
+        first_rows=np.asarray(slots)[:, np.newaxis]*4+np.arange(4)
+        rows[first_rows.ravel()]=quads.reshape(num_quads*4, -1)
+
+    def get_owners(self):
+        """Returns an array with the id that owns each slot, 0 for free slots"""
+        owners=np.zeros(self.num_slots, dtype=np.int64)
+        owners[list(self.slot_owner)]=list(self.slot_owner.values())
+        return owners
+
+    def set_quads(self, rows, owners):
+        """Fills an empty group with quads, rows are vdata rows (4 for each slot)
+        and owners the id that owns each slot (0 for free slots),
+        as returned by get_rows() and get_owners() """
+        self.num_slots=len(owners)
+        self.capacity=self.num_slots
+        self._set_num_rows(self.num_slots*self.rows_per_slot)
+        self.reset_writers()
+        self.get_rows()[:]=rows
+        owners=np.asarray(owners)
+        used=np.nonzero(owners)[0]
+        self.slot_owner=dict(zip(used.tolist(), owners[used].tolist()))
+        self.free_slots=set(np.nonzero(owners == 0)[0].tolist())
+
+    def _release_slot(self, slot):
+        """Marks the slot as free, free slots at the end are given back
+        so the next new quads take them"""
+        del self.slot_owner[slot]
+        self.free_slots.add(slot)
+        while self.num_slots-1 in self.free_slots:
+            self.num_slots-=1
+            self.free_slots.discard(self.num_slots)
+
+    def free_slot(self, slot):
+        """Collapses the quad in the slot to zero-area and marks it as free"""
+        self._release_slot(slot)
+        self.vertex.set_row(slot*4)
+        self.color_id.set_row(slot*4)
+        for i in range(4):
+            self.vertex.set_data4(0, 0, 0, 1)
+            self.color_id.set_data4(0, 0, 0, 0)
+
+    def get_capacity_for(self, num_quads):
+        """Returns the capacity to reserve for a number of quads (power of 2)"""
+        return max(self.min_capacity, 1 << max(0, num_quads-1).bit_length())
+
+    def reserve(self, capacity):
+        """Makes room for capacity quads, the new slots are zero-area quads"""
+        if capacity <= self.capacity:
+            return
+        old_capacity=self.capacity
+        self.capacity=capacity
+        rows=self.get_rows()
+        rows[old_capacity*4:]=0.0
+        #vertex.w
+        rows[old_capacity*4:, 3]=1.0
+        del rows
+        if self.tris is not None:
+            self._set_triangles()
+        self.reset_writers()
+
+    def _set_triangles(self):
+        """Points the primitive at the shared indices for all the slots"""
+        indices=get_quad_indices(self.capacity)
+        self.tris.set_index_type(indices.get_array_format().get_column(0).get_numeric_type())
+        self.tris.set_vertices(indices)
+
+    def make_geom(self):
+        """Returns a Geom for the group, with some slots reserved"""
+        self.tris = GeomTriangles(Geom.UHDynamic)
+        self.reserve(self.get_capacity_for(self.num_slots))
+        self._set_triangles()
+        geom = Geom(self.vdata)
+        geom.add_primitive(self.tris)
+        return geom
+
+    def get_fragmentation(self):
+        """Returns the fraction of slots that are free """
+        if self.num_slots == 0:
+            return 0.0
+        return len(self.free_slots)/self.num_slots
+
+    def compact(self):
+        """Moves the quads down into the free slots, keeping their order
+        (the draw order), and shrinks the vdata (and index buffer) down
+        to the capacity needed, returns a {old_slot:new_slot} dict of moved quads """
+        moved={}
+        if not self.free_slots:
+            return moved
+        rows=np.frombuffer(memoryview(self.vdata.modify_array(self.quad_array)), dtype=np.uint8)
+        #one row per slot
+        rows=rows.reshape(self._get_num_rows()//self.rows_per_slot, -1)
+        used_slots=sorted(self.slot_owner)
+        rows[:len(used_slots)]=rows[used_slots]
+        del rows
+        slot_owner={}
+        for new_slot, old_slot in enumerate(used_slots):
+            slot_owner[new_slot]=self.slot_owner[old_slot]
+            if old_slot != new_slot:
+                moved[old_slot]=new_slot
+        self.slot_owner=slot_owner
+        self.num_slots=len(self.slot_owner)
+        self.free_slots=set()
+        self._set_num_rows(self.num_slots*self.rows_per_slot)
+        self.capacity=self.num_slots
+        if self.tris is not None:
+            self.reserve(self.get_capacity_for(self.num_slots))
+            self._set_triangles()
+        self.reset_writers()
+        return moved
+
+class InstancedQuadGroup(QuadGroup):
+    """A QuadGroup drawn with hardware instancing, each quad is one row
+    (an instance) in the second vdata array: pos and size, uv rect,
+    hover/click offsets, id and mode and the nine-slice border. The first array is a unit quad that
+    the vertex shader moves to each instance, so a quad takes 64 bytes
+    instead of the 288 of the 4 vertices of a QuadGroup quad.
+    The node of the group needs set_instance_count(group.capacity)
+    """
+    quad_array=1
+    rows_per_slot=1
+    instanced=True
+
+    def __init__(self, name, vtx_format):
+        super().__init__(name, vtx_format)
+        #the corners of the unit quad, in the vertex order of QuadGroup
+        corners=GeomVertexWriter(self.vdata.modify_array(0), 0)
+        for corner in ((0, 0), (0, 1), (1, 0), (1, 1)):
+            corners.add_data2(*corner)
+
+    def reset_writers(self):
+        #quads are written through numpy views, see write_quad()
+        self.writers=()
+
+    def _set_num_rows(self, num_rows):
+        #only the instance array, the unit quad keeps its 4 rows
+        self.vdata.modify_array(self.quad_array).set_num_rows(num_rows)
+
+    def write_quad(self, slot, color, size, pos, uv, hover_uv, click_uv, mode, border=(0, 0)):
+        """Writes one quad into the slot from alloc_slot(),
+        color is the id as a color with the id itself as w, see Gui.id_to_color()"""
+        rows=self.get_rows()
+        columns=self.columns
+        row=rows[slot]
+        row[columns['quad']:columns['quad']+4]=(pos[0], pos[1], size[0], size[1])
+        row[columns['uv_rect']:columns['uv_rect']+4]=uv
+        row[columns['offset_uv']:columns['offset_uv']+4]=(*hover_uv, *click_uv)
+        row[columns['id_mode']:columns['id_mode']+2]=(color[3], mode)
+        row[columns['slice']:columns['slice']+2]=border
+
+    def write_quads(self, slots, ids, size, pos, uv, hover_uv, click_uv, mode=None, border=None):
+        """Writes quads into the vdata, all arguments are arrays with
+        one row per quad (size is (width, height)),
+        mode is the mode of the quad (0 for widgets),
+        border is the (x, y) border of nine-slice quads """
+        rows=self.get_rows()
+        quads=np.zeros((len(slots), rows.shape[1]), dtype=np.float32)
+        c=self.columns['quad']
+        quads[:, c:c+2]=pos
+        quads[:, c+2:c+4]=size
+        c=self.columns['uv_rect']
+        quads[:, c:c+4]=uv
+        c=self.columns['offset_uv']
+        quads[:, c:c+2]=hover_uv
+        quads[:, c+2:c+4]=click_uv
+        c=self.columns['id_mode']
+        quads[:, c]=ids
+        if mode is not None:
+            quads[:, c+1]=mode
+        if border is not None:
+            quads[:, self.columns['slice']:self.columns['slice']+2]=border
+        rows[np.asarray(slots)]=quads
+
+    def free_slot(self, slot):
+        """Collapses the quad in the slot to zero-area and marks it as free"""
+        self._release_slot(slot)
+        self.get_rows()[slot]=0.0
+
+    def reserve(self, capacity):
+        """Makes room for capacity quads, the new slots are zero-area quads"""
+        if capacity <= self.capacity:
+            return
+        old_capacity=self.capacity
+        self.capacity=capacity
+        self.get_rows()[old_capacity:]=0.0
+
+    def _set_triangles(self):
+        #the 2 triangles of the unit quad, drawn once for each instance
+        self.tris.set_index_type(Geom.NT_uint16)
+        self.tris.set_vertices(get_quad_indices(1))
@@ -1,30 +1,101 @@
-from collections import namedtuple
+import heapq
+import itertools
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
 from panda3d.core import *
 from direct.showbase.DirectObject import DirectObject
 
 from .widgets import *
+from .table import DataTable
+from .group import QuadGroup, InstancedQuadGroup
+from .picking import SpatialGrid
+from .text import Font
+from .stats import GuiStats
 from . import shaders
+from . import snapshot
 
 __all__=['Gui']
 
-GeomData = namedtuple('GeomData', 'vdata, vertex, texcoord, offset_uv, color_id')
+#clip rect (left, top, right, bottom in gui pixels) of elements that are not clipped
+NO_CLIP=(-1e9, -1e9, 1e9, 1e9)
+
+def _grow(array, size, fill):
+    """Returns a copy of the array with size rows, new rows set to fill"""
+    new_array=np.empty((size,)+array.shape[1:], dtype=array.dtype)
+    new_array[:len(array)]=array
+    new_array[len(array):]=fill
+    return new_array
+
+def _changed_rows(new, old):
+    """Returns the indices of the rows of new that differ from old"""
+    changed=new[:, 0] != old[:, 0]
+    for column in range(1, new.shape[1]):
+        changed|=new[:, column] != old[:, column]
+    return np.nonzero(changed)[0]
+
+def _quad_arrays(num_quads, size, pos, uv, hover_uv, click_uv, mode, border):
+    """Returns the quad arguments as arrays with num_quads rows"""
+    size=np.asarray(size, dtype=np.float32)
+    if size.ndim < 2:
+        size=np.stack((size, size), axis=-1)
+    return (np.broadcast_to(size, (num_quads, 2)),
+            np.broadcast_to(np.asarray(pos, dtype=np.float32), (num_quads, 2)),
+            np.broadcast_to(np.asarray(uv, dtype=np.float32), (num_quads, 4)),
+            np.broadcast_to(np.asarray(hover_uv, dtype=np.float32), (num_quads, 2)),
+            np.broadcast_to(np.asarray(click_uv, dtype=np.float32), (num_quads, 2)),
+            np.broadcast_to(np.asarray(mode, dtype=np.float32), (num_quads,)),
+            np.broadcast_to(np.asarray(border, dtype=np.float32), (num_quads, 2)))
 
 class Gui(DirectObject):
-    def __init__(self, texture_atlas='tex/ui_atlas.png'):
+    """The gui, owns all the groups, widgets and data tables.
+    pick_mode is how the id under the mouse is found on click and hover:
+    'cpu' - look up the widget rectangles in a SpatialGrid, no rendering,
+            the hovered id is given to the shader as the hover_id input
+    'gpu' - render and read back the id buffer, pixel exact (alpha tested)
+    'gpu_async' - like 'gpu' but the read back is requested and used a frame
+                  later, so clicks are resolved with one frame of latency
+    The gpu modes render the gui a second time each frame (to a 1x1 buffer
+    under the mouse), the shader reads the hovered id from that buffer.
+    If compact_threshold is set, groups with more than that fraction of
+    free quad slots are compacted in the update task (one group per frame)
+    clipping, hover and text turn the shader features on or off
+    If instanced is True quads are drawn with hardware instancing,
+    one 64 byte record for each quad instead of 4 vertices (see InstancedQuadGroup)
+    """
+    def __init__(self, texture_atlas='tex/ui_atlas.png', pick_mode='cpu', compact_threshold=None,
+                 clipping=True, hover=True, text=True, instanced=False):
         #vars
+        self.pick_mode=pick_mode
+        self.shader_flags={'clipping':clipping, 'hover':hover, 'text':text,
+                           'mouse_spy':pick_mode != 'cpu', 'instanced':instanced}
+        self.instanced=instanced
+        self.group_type=InstancedQuadGroup if instanced else QuadGroup
+        self.compact_threshold=compact_threshold
         self.mouse_is_down=False
         self.last_mouse_down_id=None
         self.last_frame_mouse_is_down=False
         self.last_frame_mouse_pos=Vec2(0)
-        self.update_pos_scale=False
-        self.update_clips=False
+        #mouse movement while waiting for an async pick
+        self.pending_hold_delta=Vec2(0)
+        #async picks waiting for the read back: (image_modified, callback)
+        self.pending_picks=deque()
         self.element_id={}
         self.elements={}
         self.nodes={}
         self.groups={}
+        #id -> list of (group_name, slot) of the quads of that element
+        self.element_quads={}
+        #quads waiting to be written, see bulk()
+        self.bulk_quads=None
+        #timers and counters, see GuiStats
+        self.stats=GuiStats()
         self.click_commands={}
         self.hold_commands={}
         self.next_id=1
+        #ids released by destroyed elements, as a heap so low ids are reused first
+        self.free_ids=[]
+        self.name_counter=itertools.count()
         self.win_focused=True
         self.win_minimized=False
         self.win_size=base.get_size()
@@ -41,6 +112,12 @@ class Gui(DirectObject):
         self.gui_id_tex.set_wrap_v(Texture.WM_clamp)
         #main buff
         self.buff=self._make_buffer("gui_canvas", self.win_size, self.gui_id_tex, self.gui_color_tex)
+        #the main buff is only drawn on frames where something changed,
+        #else the gui_color_tex of the last drawn frame is shown, see redraw()
+        self.needs_redraw=True
+        self.redraw_frame=-1
+        #last seen modification of the vertex data of each closed group
+        self.group_modified={}
         self.gui_cam=base.make_camera(win=self.buff)
         self.gui_cam.reparent_to(self.gui_root)
         self.gui_cam.set_pos(self.win_size[0]//2,self.win_size[1]//2,100)
@@ -48,48 +125,67 @@ class Gui(DirectObject):
         lens = OrthographicLens()
         lens.set_film_size(*self.win_size)
         self.gui_cam.node().set_lens(lens)
-        #mouse pixel buff
-        self.mouse_tex=Texture()
-        self.mouse_buff=self._make_buffer("mouse_spy", (1,1), self.mouse_tex)
-        self.mouse_cam=base.make_camera(win=self.mouse_buff)
-        self.mouse_cam.reparent_to(self.gui_root)
-        self.mouse_cam.set_pos(0, 0, 100)
-        self.mouse_cam.set_p(-90)
-        lens = OrthographicLens()
-        lens.set_film_size(1, 1)
-        self.mouse_cam.node().set_lens(lens)
-        #shader for the mouse cam - ignored WFT?
-        #the idea was to render the gui using a shader that outputs the color_id
-        #so that we don't need a second render target
-        #but the camera just ignores the shader, no idea why
-        #state_node = NodePath(PandaNode("state_node"))
-        #state_node.set_shader(Shader.load(Shader.SL_GLSL, 'v.glsl', 'f.glsl'), 1)
-        #self.mouse_cam.node().set_initial_state(state_node.get_state())
-
-
-        #pfm for dynamic data
-        #clip planes
-        self.pfm_clips=PfmFile()
-        self.pfm_clips.clear(x_size=128, y_size=128, num_channels=4)
-        self.pfm_clips.fill(Point4(self.win_size[1], 0.0, self.win_size[0], 0.0))#top, bottom, left, right in gl_FragCoord
+        #mouse pixel buff, only for the gpu pick modes
+        self.mouse_tex=None
+        self.mouse_buff=None
+        self.mouse_cam=None
+        #ram copy of the mouse pixel, only made when a pick is requested
+        self.pick_tex=Texture()
+        if self.pick_mode != 'cpu':
+            self._make_mouse_buffer()
+        #id under the mouse for hover in the 'cpu' pick_mode
+        self.hover_id=0
+
+        #tables for dynamic data
+        #clip rects, left, top, right, bottom in gui pixels
+        #resolved from the local clips, empty for elements that are clipped away
+        self.clips=DataTable('clips', NO_CLIP)
         #pos, scale
-        self.pfm_pos_scale=PfmFile()
-        self.pfm_pos_scale.clear(x_size=128, y_size=128, num_channels=4)
-        self.pfm_pos_scale.fill(Point4(0.0, 0.0, 1.0, 1.0))
+        self.pos_scale=DataTable('pos_scale', (0.0, 0.0, 1.0, 1.0))
+        #local bounds of the quads of each id (left, top, right, bottom)
+        self.bounds=np.empty((len(self.pos_scale.data), 4), dtype=np.float32)
+        self.bounds[:]=(np.inf, np.inf, -np.inf, -np.inf)
+        #draw order of the last quad of each id, the top element is picked
+        #(ids are reused, so a newer element may have a lower id)
+        self.layers=np.zeros(len(self.pos_scale.data), dtype=np.int64)
+        #group name -> index, groups are drawn in the order they were made
+        self.group_order={}
+        #hierarchy, the pos in the pos_scale table is resolved from these
+        #parent id of each id (0 - no parent) and pos relative to the parent
+        self.parents=np.zeros(len(self.pos_scale.data), dtype=np.int64)
+        self.local_pos=np.zeros((len(self.pos_scale.data), 2), dtype=np.float32)
+        #clip rect of each id relative to its pos, children are clipped by it too
+        self.local_clips=np.empty((len(self.pos_scale.data), 4), dtype=np.float32)
+        self.local_clips[:]=NO_CLIP
+        #visibility flag of each id, elements are hidden with all their children
+        self.visible=np.ones(len(self.pos_scale.data), dtype=bool)
+        #set once any element gets a clip or is hidden, until then resolving clips is skipped
+        self.clips_used=False
+        #ids sorted by depth and the start of each depth level in that order
+        self.hierarchy_order=None
+        self.hierarchy_levels=None
+        self.hierarchy_dirty=False
+        #ids that need to be updated in the pick_grid
+        self.dirty_pick=set()
+        self.pick_grid=SpatialGrid()
 
         #set some default shader inputs
         self.tex_atlas=loader.load_texture(texture_atlas)
         self.tex_atlas.setMagfilter(SamplerState.FT_linear)
         self.tex_atlas.setMinfilter(SamplerState.FT_linear)
         self.gui_root.set_shader_input('atlas', self.tex_atlas)
-        self.clip_tex=Texture()
-        self.clip_tex.load(self.pfm_clips)
+        self.clip_tex=self.clips.tex
         self.gui_root.set_shader_input('clips', self.clip_tex)
-        self.pos_scale_tex=Texture()
-        self.pos_scale_tex.load(self.pfm_pos_scale)
+        self.pos_scale_tex=self.pos_scale.tex
         self.gui_root.set_shader_input('pos_scale', self.pos_scale_tex)
+        self.gui_root.set_shader_input('table_size', LVecBase2i(self.pos_scale.width, self.pos_scale.height))
         self.gui_root.set_shader_input('click', 0.0)
-        self.gui_root.set_shader_input('mouse_tex', self.mouse_tex)
+        if self.mouse_tex is not None:
+            self.gui_root.set_shader_input('mouse_tex', self.mouse_tex)
+        self.gui_root.set_shader_input('hover_id', 0.0)
+        #the font atlas, see set_font()
+        self.font=None
+        self.gui_root.set_shader_input('font', self.tex_atlas)
 
         #quad to display the gui on-screen
         cm = CardMaker("plane")
@@ -102,6 +198,8 @@ class Gui(DirectObject):
 
         #tasks:
         taskMgr.add(self.update, 'update_tsk')
+        #after update, once per frame (update also runs on mouse up)
+        taskMgr.add(self.update_stats, 'update_stats_tsk', sort=1)
         #events:
         self.accept('mouse1', self.on_mouse_down)
         self.accept('mouse1-up', self.on_mouse_up)
@@ -114,22 +212,113 @@ class Gui(DirectObject):
             return self.elements[self.element_id[item]]
         return None
 
+    def set_font(self, font):
+        """Sets the Font used for text, one font for the whole gui
+        (the glyphs are drawn in the groups with the other quads)"""
+        if not isinstance(font, Font):
+            font=Font(font)
+        self.font=font
+        self.gui_root.set_shader_input('font', font.tex)
+        self.redraw()
+
     def get_id(self, name):
         if name not in self.element_id:
-            self.element_id[name]=self.next_id
-            self.next_id+=1
+            if self.free_ids:
+                id=heapq.heappop(self.free_ids)
+            else:
+                id=self.next_id
+                self.next_id+=1
+                self._reserve_tables(id)
+            self.element_id[name]=id
         return self.element_id[name]
 
+    def release_id(self, name):
+        """Frees the id of the named element so it can be given to a new element,
+        call it only when there are no quads left using that id"""
+        id=self.element_id.pop(name, None)
+        if id is None:
+            return
+        self.click_commands.pop(id, None)
+        self.hold_commands.pop(id, None)
+        self.set_parent(id, 0)
+        #orphans become root elements
+        orphans=np.nonzero(self.parents == id)[0]
+        if len(orphans):
+            if self.hierarchy_dirty:
+                self.resolve_hierarchy()
+            self.local_pos[orphans]=self.pos_scale.data[orphans, 0:2]
+            self.parents[orphans]=0
+            self.hierarchy_order=None
+        self.local_pos[id]=0.0
+        self.local_clips[id]=NO_CLIP
+        self.visible[id]=True
+        self.pos_scale.reset(id)
+        self.clips.reset(id)
+        self.bounds[id]=(np.inf, np.inf, -np.inf, -np.inf)
+        self.layers[id]=0
+        self.dirty_pick.discard(id)
+        self.pick_grid.remove(id)
+        heapq.heappush(self.free_ids, id)
+
+    def new_name(self, prefix='widget_'):
+        """Returns a unique name for an element that was not given one """
+        name=prefix+str(next(self.name_counter))
+        while name in self.element_id:
+            name=prefix+str(next(self.name_counter))
+        return name
+
+    def _reserve_tables(self, id):
+        """Grows the data tables if the id does not fit """
+        if id < len(self.pos_scale.data):
+            return
+        self.pos_scale.reserve(id)
+        self.clips.reserve(id)
+        size=len(self.pos_scale.data)
+        self.bounds=_grow(self.bounds, size, (np.inf, np.inf, -np.inf, -np.inf))
+        self.layers=_grow(self.layers, size, 0)
+        self.parents=_grow(self.parents, size, 0)
+        self.local_pos=_grow(self.local_pos, size, 0.0)
+        self.local_clips=_grow(self.local_clips, size, NO_CLIP)
+        self.visible=_grow(self.visible, size, True)
+        self.gui_root.set_shader_input('table_size', LVecBase2i(self.pos_scale.width, self.pos_scale.height))
+
+    def redraw(self):
+        """Draws the gui again in the next frame, the gui tracks its own
+        changes, this is only needed after changing something under
+        gui_root (or its shader inputs) directly"""
+        self.needs_redraw=True
+
+    def _update_redraw(self):
+        """Turns the main buff on for this frame if anything it shows
+        changed since the last drawn frame, off if nothing did"""
+        for group_name, node in self.nodes.items():
+            group=self.groups[group_name]
+            modified=group.vdata.get_array(group.quad_array).get_modified()
+            if self.group_modified.get(group_name) != modified:
+                self.group_modified[group_name]=modified
+                self.needs_redraw=True
+                if group.instanced and node.get_instance_count() != group.capacity:
+                    node.set_instance_count(group.capacity)
+        frame=ClockObject.get_global_clock().get_frame_count()
+        if self.needs_redraw:
+            self.needs_redraw=False
+            self.redraw_frame=frame
+            self.buff.set_active(True)
+        elif frame != self.redraw_frame:
+            #update() may run more than once a frame, keep a redraw asked for earlier
+            self.buff.set_active(False)
+        self.stats.set('redraw', int(self.redraw_frame == frame))
+
     def on_window_resize(self):
         size=base.get_size()
         self.buff.set_size(*size)
+        self.redraw()
         self.gui_cam.node().get_lens().set_film_size(*size)
         self.gui_cam.set_pos(size[0]//2,size[1]//2,100)
 
         for node in self.nodes.values():
             node.node().set_bounds(BoundingBox((0,0,0), (size[0], size[1], 1000)))
-
-        ##TODO: update clip planes!
+        #clips are in gui pixels, they don't change with the window size
 
     def on_window_minimize(self):
         pass
@@ -151,12 +340,15 @@ class Gui(DirectObject):
         """Fired when the mouse button is pressed"""
         self.mouse_is_down=True
         self.gui_root.set_shader_input('click', 1.0)
-        base.graphicsEngine.render_frame()
-        p=PNMImage(1, 1,4)
-        base.graphicsEngine.extract_texture_data(self.mouse_tex, base.win.getGsg())
-        self.mouse_tex.store(p)
-        c=p.getXelA(0,0)
-        self.last_mouse_down_id=self.color_to_id(c)
+        self.redraw()
+        if self.pick_mode == 'gpu_async':
+            self.last_mouse_down_id=None
+            self.request_pick(self._on_mouse_down_pick)
+        else:
+            self.last_mouse_down_id=self.pick()
+
+    def _on_mouse_down_pick(self, id):
+        self.last_mouse_down_id=id
 
     def on_mouse_up(self):
         """Fired when the mouse button is released"""
@@ -166,63 +358,289 @@ class Gui(DirectObject):
             self.update()
         self.mouse_is_down=False
         self.gui_root.set_shader_input('click', 0.0)
+        self.redraw()
 
     def on_mouse_hold(self, delta):
         """Fired each frame when the mouse button is held"""
+        if self.last_mouse_down_id is None:
+            #the async pick is not ready, keep the delta for later
+            self.pending_hold_delta+=delta
+            return
+        if self.pending_hold_delta.length_squared()>0.0:
+            delta=delta+self.pending_hold_delta
+            self.pending_hold_delta=Vec2(0)
         if delta.length_squared()>0.0:
             id=self.last_mouse_down_id
             if id != 0 and id in self.hold_commands:
-                self.hold_commands[id](delta)
+                with self.stats.timer('commands'):
+                    self.hold_commands[id](delta)
 
 
     def on_mouse_click(self):
         """Fired on mouse click"""
+        if self.pick_mode == 'gpu_async':
+            self.request_pick(self._on_click_pick)
+        else:
+            self._on_click_pick(self.pick())
+
+    def _on_click_pick(self, id):
+        self.pending_hold_delta=Vec2(0)
+        if id != 0 and id == self.last_mouse_down_id:
+            if id in self.click_commands:
+                with self.stats.timer('commands'):
+                    self.click_commands[id]()
+
+    def get_mouse_pos(self):
+        """Returns the mouse position in gui pixels or None"""
+        #no mouseWatcherNode if running without a window
+        if base.mouseWatcherNode is not None and base.mouseWatcherNode.hasMouse():
+            mouse_pos = (base.mouseWatcherNode.get_mouse()+Point2(1.0, 1.0))/2.0
+            mouse_pos.x=mouse_pos.x*self.win_size[0]
+            mouse_pos.y=self.win_size[1]-(mouse_pos.y*self.win_size[1])
+            return mouse_pos
+        return None
+
+    def pick(self):
+        """Returns the id under the mouse cursor, 0 if none"""
+        with self.stats.timer('pick'):
+            if self.pick_mode == 'cpu':
+                mouse_pos=self.get_mouse_pos()
+                if mouse_pos is None:
+                    return 0
+                return self.pick_at(*mouse_pos)
+            return self._gpu_pick()
+
+    def pick_at(self, x, y):
+        """Returns the id at x, y (in gui pixels) using the pick_grid"""
+        if self.hierarchy_dirty:
+            self.resolve_hierarchy()
+        if self.dirty_pick:
+            self._update_pick_grid()
+        return self.pick_grid.query(x, y)
+
+    def _update_pick_grid(self):
+        ids=np.fromiter(self.dirty_pick, dtype=np.int64, count=len(self.dirty_pick))
+        self.dirty_pick.clear()
+        pos_scale=self.pos_scale.data[ids]
+        bounds=self.bounds[ids]
+        clips=self.clips.data[ids]
+        rects=np.empty((len(ids), 4), dtype=np.float32)
+        rects[:, 0:2]=np.maximum(pos_scale[:, 0:2]+bounds[:, 0:2]*pos_scale[:, 2:4], clips[:, 0:2])
+        rects[:, 2:4]=np.minimum(pos_scale[:, 0:2]+bounds[:, 2:4]*pos_scale[:, 2:4], clips[:, 2:4])
+        self.pick_grid.update_many(ids, rects, self.layers[ids])
+
+    def _update_hover(self, mouse_pos):
+        """Finds the id under the mouse on the CPU and gives it to the shader,
+        only looked up when the mouse or some element moved"""
+        if mouse_pos is None:
+            hover_id=0
+        elif mouse_pos != self.last_frame_mouse_pos or self.dirty_pick:
+            with self.stats.timer('pick'):
+                hover_id=self.pick_at(*mouse_pos)
+        else:
+            return
+        if hover_id != self.hover_id:
+            self.hover_id=hover_id
+            self.gui_root.set_shader_input('hover_id', float(hover_id))
+            self.redraw()
+
+    def request_pick(self, callback):
+        """Asks for the id under the mouse without stalling the pipeline,
+        the mouse pixel is copied to ram at the end of the next rendered frame
+        and callback(id) is called from update() once it is there.
+        Only works with pick_mode='gpu_async'"""
+        self.mouse_buff.trigger_copy()
+        self.pending_picks.append((self.pick_tex.get_image_modified(), callback))
+
+    def _resolve_picks(self):
+        if not self.pending_picks:
+            return
+        modified=self.pick_tex.get_image_modified()
+        if modified == self.pending_picks[0][0]:
+            #not copied yet
+            return
+        with self.stats.timer('pick'):
+            rgb=self.pick_tex.get_ram_image_as('RGB').get_data()
+            id=rgb[0] << 16 | rgb[1] << 8 | rgb[2]
+        #requests made before the copy share its result
+        while self.pending_picks and self.pending_picks[0][0] != modified:
+            self.pending_picks.popleft()[1](id)
+
+    def _gpu_pick(self):
         base.graphicsEngine.render_frame()
         p=PNMImage(1, 1,4)
         base.graphicsEngine.extract_texture_data(self.mouse_tex, base.win.getGsg())
         self.mouse_tex.store(p)
         c=p.getXelA(0,0)
-        id=self.color_to_id(c)
-        if id != 0 and id == self.last_mouse_down_id:
-            if id in self.click_commands:
-                self.click_commands[id]()
-
-    def set_clip(self, id, top, bottom, left=0, right=0):
-        x=id%128
-        y=id//128
-        self.pfm_clips.set_point4(x, y, Point4(top, bottom, left, right))
-        self.update_clips=True
-        #self.clip_tex.load(self.pfm_clips)
-        #self.gui_root.set_shader_input('clips', t)
+        return self.color_to_id(c)
+
+    def set_clip(self, id, *, left, top, right, bottom):
+        """Clips the element and its children to the rect (in pixels, relative to the element pos)"""
+        self.local_clips[id]=(left, top, right, bottom)
+        self.clips_used=True
+        self.hierarchy_dirty=True
+
+    def clear_clip(self, id):
+        """Removes the clip rect of the element"""
+        left, top, right, bottom=NO_CLIP
+        self.set_clip(id, left=left, top=top, right=right, bottom=bottom)
+
+    def set_visible(self, id, visible=True):
+        """Shows or hides the element and all its children,
+        a child is only shown if all its ancestors are"""
+        self.set_visible_many([id], visible)
+
+    def set_visible_many(self, ids, flags):
+        """Shows or hides many elements (and their children) at once,
+        ids is a sequence of ids, flags is a bool array (one for each id)
+        or a single bool used for all the ids.
+        Hidden elements get an empty clip, their quads are culled in the
+        vertex shader and they can't be picked"""
+        ids=np.asarray(ids, dtype=np.int64)
+        flags=np.broadcast_to(np.asarray(flags, dtype=bool), ids.shape)
+        if np.array_equal(self.visible[ids], flags):
+            return
+        self.visible[ids]=flags
+        self.clips_used=True
+        self.hierarchy_dirty=True
+
+    def is_visible(self, id):
+        """True if the element is not hidden (its ancestors may still be)"""
+        return bool(self.visible[id])
 
     def get_pos_scale(self, id):
-        uv_x=id%128
-        uv_y=id//128
-        return self.pfm_pos_scale.get_point4(uv_x, uv_y)
+        """Returns the pos (relative to the gui, not the parent) and scale"""
+        if self.hierarchy_dirty:
+            self.resolve_hierarchy()
+        return Point4(*self.pos_scale.data[id])
+
+    def get_local_pos(self, id):
+        """Returns the pos relative to the parent"""
+        return Point2(*self.local_pos[id])
 
     def set_pos_scale(self, id, x=None, y=None, sx=None, sy=None):
-        uv_x=id%128
-        uv_y=id//128
-        data=self.pfm_pos_scale.modify_point4(uv_x, uv_y)
+        """Sets the pos (relative to the parent) and/or the scale"""
         if x is not None:
-            data[0]=x
+            self.local_pos[id, 0]=x
         if y is not None:
-            data[1]=y
+            self.local_pos[id, 1]=y
+        data=self.pos_scale.data[id]
         if sx is not None:
-            data[2]=sy
+            data[2]=sx
         if sy is not None:
             data[3]=sy
-        self.update_pos_scale=True
+        self.pos_scale.mark(id)
+        self.dirty_pick.add(id)
+        self.hierarchy_dirty=True
 
     def set_delta_pos(self, id, x=None, y=None):
-        uv_x=id%128
-        uv_y=id//128
-        data=self.pfm_pos_scale.modify_point4(uv_x, uv_y)
+        """Moves the element (and all its children) by x, y"""
         if x is not None:
-            data[0]+=x
+            self.local_pos[id, 0]+=x
         if y is not None:
-            data[1]+=y
-        self.update_pos_scale=True
+            self.local_pos[id, 1]+=y
+        self.hierarchy_dirty=True
+
+    def set_pos_scale_many(self, ids, xy=None, scale=None):
+        """Sets the pos (relative to the parent) and/or scale of many elements
+        at once, ids is a sequence of ids, xy and scale are (len(ids), 2) arrays
+        or a single (x, y) pair used for all the ids"""
+        ids=np.asarray(ids, dtype=np.int64)
+        if xy is not None:
+            self.local_pos[ids]=xy
+            self.hierarchy_dirty=True
+        if scale is not None:
+            self.pos_scale.data[ids, 2:4]=scale
+            self.pos_scale.mark(ids)
+            self.dirty_pick.update(ids.tolist())
+            self.hierarchy_dirty=True
+
+    def move_many(self, ids, delta):
+        """Moves many elements (and their children) at once,
+        ids is a sequence of unique ids, delta is a (len(ids), 2) array
+        or a single (x, y) pair used for all the ids"""
+        ids=np.asarray(ids, dtype=np.int64)
+        self.local_pos[ids]+=delta
+        self.hierarchy_dirty=True
+
+    def set_parent(self, id, parent_id):
+        """Makes the element a child of the parent_id element (0 for none),
+        the pos of the element is relative to the pos of its parent"""
+        if self.parents[id] == parent_id:
+            return
+        ancestor=parent_id
+        while ancestor:
+            if ancestor == id:
+                raise ValueError('Element {0} can not be a child of its own child {1}'.format(id, parent_id))
+            ancestor=self.parents[ancestor]
+        self.parents[id]=parent_id
+        self.hierarchy_order=None
+        self.hierarchy_dirty=True
+
+    def _sort_hierarchy(self):
+        """Sorts the ids by their depth in the hierarchy"""
+        parents=self.parents[:self.next_id]
+        depth=np.zeros(len(parents), dtype=np.int64)
+        ancestors=parents.copy()
+        while ancestors.any():
+            has_ancestor=ancestors != 0
+            depth[has_ancestor]+=1
+            ancestors=parents[ancestors]
+        self.hierarchy_order=np.argsort(depth, kind='stable')
+        self.hierarchy_levels=np.searchsorted(depth[self.hierarchy_order], np.arange(1, depth.max()+2))
+
+    def resolve_hierarchy(self):
+        """Updates the pos in the pos_scale table from the local pos
+        and the clips table from the local clips and visibility,
+        one vectorized pass for each level of the hierarchy"""
+        self.hierarchy_dirty=False
+        if self.hierarchy_order is None or len(self.hierarchy_order) != self.next_id:
+            self._sort_hierarchy()
+        num_ids=self.next_id
+        world_pos=self.local_pos[:num_ids].copy()
+        order=self.hierarchy_order
+        levels=self.hierarchy_levels
+        for start, end in zip(levels[:-1], levels[1:]):
+            ids=order[start:end]
+            world_pos[ids]+=world_pos[self.parents[ids]]
+        changed=_changed_rows(world_pos, self.pos_scale.data[:num_ids, 0:2])
+        if len(changed):
+            self.pos_scale.data[changed, 0:2]=world_pos[changed]
+            self.pos_scale.mark(changed)
+            self.dirty_pick.update(changed.tolist())
+        if not self.clips_used:
+            #no element was ever clipped or hidden, the clips table is still all NO_CLIP
+            return
+        #clips, each is the intersection of the local clip and the clip of the parent
+        #without the clipping shader feature only hidden elements are culled
+        if self.shader_flags['clipping']:
+            clips=self.local_clips[:num_ids]+np.tile(world_pos, 2)
+        else:
+            clips=np.tile(np.array(NO_CLIP, dtype=np.float32), (num_ids, 1))
+        visible=self.visible[:num_ids].copy()
+        for start, end in zip(levels[:-1], levels[1:]):
+            ids=order[start:end]
+            parents=self.parents[ids]
+            parent_clips=clips[parents]
+            clips[ids, 0:2]=np.maximum(clips[ids, 0:2], parent_clips[:, 0:2])
+            clips[ids, 2:4]=np.minimum(clips[ids, 2:4], parent_clips[:, 2:4])
+            visible[ids]&=visible[parents]
+        #hidden elements and elements with no quads inside their clip get
+        #an empty clip, their quads are culled in the vertex shader
+        scale=self.pos_scale.data[:num_ids, 2:4]
+        bounds=self.bounds[:num_ids]
+        left=world_pos[:, 0]+bounds[:, 0]*scale[:, 0]
+        top=world_pos[:, 1]+bounds[:, 1]*scale[:, 1]
+        right=world_pos[:, 0]+bounds[:, 2]*scale[:, 0]
+        bottom=world_pos[:, 1]+bounds[:, 3]*scale[:, 1]
+        visible&=(left < clips[:, 2]) & (top < clips[:, 3]) & (right > clips[:, 0]) & (bottom > clips[:, 1])
+        visible&=(clips[:, 0] < clips[:, 2]) & (clips[:, 1] < clips[:, 3])
+        clips[~visible]=0.0
+        changed=_changed_rows(clips, self.clips.data[:num_ids])
+        if len(changed):
+            self.clips.data[changed]=clips[changed]
+            self.clips.mark(changed)
+            self.dirty_pick.update(changed.tolist())
 
     def color_to_id(self, color):
         ap = int(color[0] * 255)
@@ -240,104 +658,227 @@ class Gui(DirectObject):
 
     def update(self, task=None):
         """ Update task run every frame, or more often (on_mouse_up)"""
-        #update inputs
-        if self.update_clips:
-            self.update_clips=False
-            self.clip_tex.load(self.pfm_clips)
-            #self.gui_root.set_shader_input('clips', self.clip_tex)
-        if self.update_pos_scale:
-            self.update_pos_scale=False
-            self.pos_scale_tex.load(self.pfm_pos_scale)
-            #self.gui_root.set_shader_input('pos_scale', self.pos_scale_tex)
-        #track mouse
-        if base.mouseWatcherNode.hasMouse():
-            mouse_pos = (base.mouseWatcherNode.get_mouse()+Point2(1.0, 1.0))/2.0
-            mouse_pos.x=mouse_pos.x*self.win_size[0]
-            mouse_pos.y=self.win_size[1]-(mouse_pos.y*self.win_size[1])
-            self.mouse_cam.set_pos(mouse_pos.x, mouse_pos.y, 100)
-            #dispatch click events if any
-            if not self.mouse_is_down and self.last_frame_mouse_is_down:
-                self.on_mouse_click()
-            elif self.mouse_is_down:
-                delta=mouse_pos-self.last_frame_mouse_pos
-                self.on_mouse_hold(delta)
-            #store for next frame
-            self.last_frame_mouse_pos=mouse_pos
-            self.last_frame_mouse_is_down=self.mouse_is_down
+        with self.stats.timer('update'):
+            self._resolve_picks()
+            if self.hierarchy_dirty:
+                self.resolve_hierarchy()
+            if self.compact_threshold is not None:
+                for name, group in self.groups.items():
+                    if group.get_fragmentation() > self.compact_threshold:
+                        self.compact_group(name)
+                        break
+            #update inputs, only if something changed
+            with self.stats.timer('upload'):
+                self.stats.add('marked_ids', self.clips.num_marked+self.pos_scale.num_marked)
+                uploaded_bytes=self.clips.upload()+self.pos_scale.upload()
+                self.stats.add('uploaded_bytes', uploaded_bytes)
+            if uploaded_bytes:
+                self.redraw()
+            #track mouse
+            mouse_pos=self.get_mouse_pos()
+            if self.mouse_cam is not None:
+                if mouse_pos is not None and mouse_pos != self.last_frame_mouse_pos:
+                    self.mouse_cam.set_pos(mouse_pos.x, mouse_pos.y, 100)
+                    #hover comes from the mouse spy, it may change with the mouse
+                    self.redraw()
+            elif self.shader_flags['hover']:
+                self._update_hover(mouse_pos)
+            if mouse_pos is not None:
+                #dispatch click events if any
+                if not self.mouse_is_down and self.last_frame_mouse_is_down:
+                    self.on_mouse_click()
+                elif self.mouse_is_down:
+                    delta=mouse_pos-self.last_frame_mouse_pos
+                    self.on_mouse_hold(delta)
+                #store for next frame
+                self.last_frame_mouse_pos=mouse_pos
+                self.last_frame_mouse_is_down=self.mouse_is_down
+            self._update_redraw()
         #run task again, if called from a task
         if task:
             return task.again
 
+    def update_stats(self, task=None):
+        """Stats task run once every frame, sets the counters and ends the stats frame"""
+        self.stats.set('groups', len(self.nodes))
+        self.stats.set('allocated_quads', sum(len(self.groups[name].slot_owner) for name in self.nodes))
+        self.stats.end_frame()
+        if task:
+            return task.again
+
     def _get_vertex_format(self):
         try:
             vtx_format=self._vtx_format
         except AttributeError:
-            array = GeomVertexArrayFormat()
-            array.add_column("vertex", 4, Geom.NT_float32, Geom.C_point)
-            array.add_column("texcoord", 2, Geom.NT_float32, Geom.C_texcoord)
-            array.add_column("offset_uv", 4, Geom.NT_float32, Geom.C_other)
-            array.add_column("color_id", 4, Geom.NT_float32, Geom.C_other)
             self._vtx_format = GeomVertexFormat()
+            if self.instanced:
+                #the unit quad, and one row per quad (instance)
+                array = GeomVertexArrayFormat()
+                array.add_column("vertex", 2, Geom.NT_float32, Geom.C_point)
+                self._vtx_format.add_array(array)
+                array = GeomVertexArrayFormat()
+                array.add_column("quad", 4, Geom.NT_float32, Geom.C_other)
+                array.add_column("uv_rect", 4, Geom.NT_float32, Geom.C_other)
+                array.add_column("offset_uv", 4, Geom.NT_float32, Geom.C_other)
+                array.add_column("id_mode", 2, Geom.NT_float32, Geom.C_other)
+                array.add_column("slice", 2, Geom.NT_float32, Geom.C_other)
+                array.set_divisor(1)
+            else:
+                array = GeomVertexArrayFormat()
+                array.add_column("vertex", 4, Geom.NT_float32, Geom.C_point)
+                array.add_column("texcoord", 2, Geom.NT_float32, Geom.C_texcoord)
+                array.add_column("offset_uv", 4, Geom.NT_float32, Geom.C_other)
+                array.add_column("color_id", 4, Geom.NT_float32, Geom.C_other)
+                #nine-slice border and size of the quad
+                array.add_column("slice", 4, Geom.NT_float32, Geom.C_other)
             self._vtx_format.add_array(array)
             self._vtx_format = GeomVertexFormat.registerFormat(self._vtx_format)
             vtx_format=self._vtx_format
         return vtx_format
 
     def make_group(self, name):
-        vtx_format=self._get_vertex_format()
-        vdata = GeomVertexData('quad', vtx_format, Geom.UHDynamic)
-        vertex = GeomVertexWriter(vdata, 'vertex')
-        texcoord = GeomVertexWriter(vdata, 'texcoord')
-        offset_uv = GeomVertexWriter(vdata, 'offset_uv')
-        color_id = GeomVertexWriter(vdata, 'color_id')
-        self.groups[name]=GeomData(vdata, vertex, texcoord, offset_uv, color_id)
+        self.groups[name]=self.group_type(name, self._get_vertex_format())
+        self.group_order.setdefault(name, len(self.group_order))
 
-    def add_quad(self, group_name, id, size=32, pos=(0,0),
-                   uv=(0,0, 1,1), hover_uv=(0,0), click_uv=(0,0)):
+    def _get_layers(self, group_name, slots):
+        """Returns the draw order of the quads in the slots of the group,
+        quads are drawn group by group, in slot order"""
+        return (self.group_order[group_name] << 32)+slots
 
+    def add_quad(self, group_name, id, size=32, pos=(0,0),
+                   uv=(0,0, 1,1), hover_uv=(0,0), click_uv=(0,0), mode=0, tint=None, border=(0,0)):
+        """Adds a quad for the element with the given id, returns its slot.
+        size is a number for square quads or (width, height),
+        mode is 0 for widget quads, 1 for text glyphs (see Font)
+        and 2 for nine-slice quads (see SLICE_MODE),
+        glyphs have no hover/click uv, the rgba tint is stored there instead"""
+        if tint is not None:
+            hover_uv=tint[0:2]
+            click_uv=tint[2:4]
+        try:
+            size_x, size_y=size
+        except TypeError:
+            size_x=size_y=size
         group=self.groups[group_name]
+        #the writers are moved to the slot, a new one or a free one to overwrite
+        slot=group.alloc_slot(id)
+        self.element_quads.setdefault(id, []).append((group_name, slot))
+        self.layers[id]=max(self.layers[id], self._get_layers(group_name, slot))
+        #grow the bounds used for picking
+        bounds=self.bounds[id]
+        bounds[0]=min(bounds[0], pos[0])
+        bounds[1]=min(bounds[1], pos[1])
+        bounds[2]=max(bounds[2], pos[0]+size_x)
+        bounds[3]=max(bounds[3], pos[1]+size_y)
+        self.dirty_pick.add(id)
+        #the bounds are used for culling
+        self.hierarchy_dirty=True
+        if self.bulk_quads is not None:
+            self.bulk_quads.append((group_name, slot, id, (size_x, size_y), pos, uv, hover_uv, click_uv, mode, border))
+            return slot
         #color(_id) is the same for all vertex
-        color=self.id_to_color(id)
-        #geom tristrip cheat sheet:
-        #
-        #  0---2     3---1
-        #  |  /|     |  /|
-        #  | / |     | / |
-        #  |/  |     |/  |
-        #  1---3     2---0
-        #
-        # uv: uv=(0,0, 1,1)
-        #
-        #  [0][3]---[2][3]
-        #  |       /|
-        #  |      / |
-        #  |     /  |
-        #  |    /   |
-        #  |   /    |
-        #  |  /     |
-        #  | /      |
-        #  [0][1]---[2][1]
-
-        #vert 0
-        group.vertex.add_data4(pos[0], pos[1], 0, 1)
-        group.texcoord.add_data2(uv[0], uv[3])
-        group.offset_uv.add_data4(*hover_uv, *click_uv)
-        group.color_id.add_data4(*color)
-        #vert 1
-        group.vertex.add_data4(pos[0], pos[1]+size, 0, 1)
-        group.texcoord.add_data2(uv[0], uv[1])
-        group.offset_uv.add_data4(*hover_uv, *click_uv)
-        group.color_id.add_data4(*color)
-        #vert 2
-        group.vertex.add_data4(pos[0]+size, pos[1], 0, 1)
-        group.texcoord.add_data2(uv[2], uv[3])
-        group.offset_uv.add_data4(*hover_uv, *click_uv)
-        group.color_id.add_data4(*color)
-        #vert 3
-        group.vertex.add_data4(pos[0]+size, pos[1]+size, 0, 1)
-        group.texcoord.add_data2(uv[2], uv[1])
-        group.offset_uv.add_data4(*hover_uv, *click_uv)
-        group.color_id.add_data4(*color)
+        group.write_quad(slot, self.id_to_color(id), (size_x, size_y), pos, uv, hover_uv, click_uv, mode, border)
+        return slot
+
+    def add_quads(self, group_name, ids, size=32, pos=(0,0),
+                  uv=(0,0, 1,1), hover_uv=(0,0), click_uv=(0,0), mode=0, border=(0,0)):
+        """Adds many quads with one vectorized write, returns their slots.
+        ids is a sequence of ids (one per quad), the other arguments are
+        arrays with one row per quad, or a single value used for all quads.
+        size is a number (or 1D array) for square quads,
+        or a 2D array with (width, height) rows """
+        with self.stats.timer('groups'):
+            group=self.groups[group_name]
+            ids=np.asarray(ids, dtype=np.int64)
+            size, pos, uv, hover_uv, click_uv, mode, border=_quad_arrays(len(ids), size, pos, uv, hover_uv, click_uv, mode, border)
+            slots=group.alloc_slots(ids)
+            group.write_quads(slots, ids, size, pos, uv, hover_uv, click_uv, mode, border)
+            for id, slot in zip(ids.tolist(), slots.tolist()):
+                self.element_quads.setdefault(id, []).append((group_name, slot))
+            np.maximum.at(self.layers, ids, self._get_layers(group_name, slots))
+            #grow the bounds used for picking
+            np.minimum.at(self.bounds[:, 0], ids, pos[:, 0])
+            np.minimum.at(self.bounds[:, 1], ids, pos[:, 1])
+            np.maximum.at(self.bounds[:, 2], ids, pos[:, 0]+size[:, 0])
+            np.maximum.at(self.bounds[:, 3], ids, pos[:, 1]+size[:, 1])
+            self.dirty_pick.update(ids.tolist())
+            self.hierarchy_dirty=True
+            return slots
+
+    def write_quads(self, group_name, slots, ids, size=32, pos=(0,0),
+                    uv=(0,0, 1,1), hover_uv=(0,0), click_uv=(0,0), mode=0, border=(0,0)):
+        """Overwrites quads in slots given by add_quad(s), the arguments are
+        the same as for add_quads(). The bounds used for picking are not
+        changed, see set_bounds()"""
+        with self.stats.timer('groups'):
+            slots=np.asarray(slots, dtype=np.int64)
+            ids=np.broadcast_to(np.asarray(ids, dtype=np.int64), slots.shape)
+            quad_arrays=_quad_arrays(len(slots), size, pos, uv, hover_uv, click_uv, mode, border)
+            self.groups[group_name].write_quads(slots, ids, *quad_arrays)
+
+    def set_bounds(self, id, left, top, right, bottom):
+        """Sets the rectangle (relative to the element pos) used for picking"""
+        self.bounds[id]=(left, top, right, bottom)
+        self.dirty_pick.add(id)
+        self.hierarchy_dirty=True
+
+    @contextmanager
+    def bulk(self):
+        """Widgets made inside this context have their quads written to the
+        groups in one vectorized write when the context exits, eg:
+        with gui.bulk():
+            for i in range(1000):
+                Button(gui=gui, pos=(0, i*32))
+        """
+        if self.bulk_quads is not None:
+            #already in a bulk context
+            yield
+            return
+        self.bulk_quads=[]
+        try:
+            yield
+        finally:
+            bulk_quads=self.bulk_quads
+            self.bulk_quads=None
+            self._write_bulk_quads(bulk_quads)
+
+    def _write_bulk_quads(self, bulk_quads):
+        with self.stats.timer('groups'):
+            by_group={}
+            for quad in bulk_quads:
+                by_group.setdefault(quad[0], []).append(quad[1:])
+            for group_name, quads in by_group.items():
+                slots, ids, size, pos, uv, hover_uv, click_uv, mode, border=zip(*quads)
+                self.groups[group_name].write_quads(np.array(slots),
+                                                    np.array(ids),
+                                                    np.array(size, dtype=np.float32),
+                                                    np.array(pos, dtype=np.float32),
+                                                    np.array(uv, dtype=np.float32),
+                                                    np.array(hover_uv, dtype=np.float32),
+                                                    np.array(click_uv, dtype=np.float32),
+                                                    np.array(mode, dtype=np.float32),
+                                                    np.array(border, dtype=np.float32))
+
+    def remove_quads(self, id):
+        """Removes all the quads of the element with the given id,
+        free slots at the end of a group are reused by new quads"""
+        for group_name, slot in self.element_quads.pop(id, []):
+            self.groups[group_name].free_slot(slot)
+        self.bounds[id]=(np.inf, np.inf, -np.inf, -np.inf)
+        self.layers[id]=0
+        self.dirty_pick.add(id)
+
+    def compact_group(self, group_name):
+        """Moves quads into the free slots of the group (keeping their
+        draw order) and shrinks it"""
+        with self.stats.timer('groups'):
+            group=self.groups[group_name]
+            moved=group.compact()
+            for id in {group.slot_owner[new_slot] for new_slot in moved.values()}:
+                self.element_quads[id]=[(name, moved.get(slot, slot)) if name == group_name else (name, slot)
+                                        for name, slot in self.element_quads[id]]
+                self.layers[id]=max(self._get_layers(name, slot) for name, slot in self.element_quads[id])
+                self.dirty_pick.add(id)
 
     def close_all_groups(self):
         for name in self.groups:
@@ -345,29 +886,57 @@ class Gui(DirectObject):
                 self.close_group(name)
 
     def close_group(self, group_name):
-        group=self.groups[group_name]
-        geom = Geom(group.vdata)
-        tris = GeomTriangles(Geom.UHDynamic)
-        for i in range(group.vdata.get_num_rows()//4):
-            tris.add_vertex((i*4)+0)
-            tris.add_vertex((i*4)+2)
-            tris.add_vertex((i*4)+1)
-            tris.close_primitive()
-            tris.add_vertex((i*4)+2)
-            tris.add_vertex((i*4)+3)
-            tris.add_vertex((i*4)+1)
-            tris.close_primitive()
-
-        geom.add_primitive(tris)
-        gnode =GeomNode('quad')
-        gnode.add_geom(geom)
-        size=base.get_size()
-        gnode.set_bounds(BoundingBox((0,0,0), (size[0], size[1], 1000)))
-        #gnode.set_bounds(OmniBoundingVolume())
-        np=self.gui_root.attach_new_node(gnode)
-        np.set_shader(Shader.make(Shader.SLGLSL, shaders.widget.vertex, shaders.widget.fragment),1)
-        np.set_transparency(TransparencyAttrib.MAlpha, 1)
-        self.nodes[group_name]=np
+        with self.stats.timer('groups'):
+            group=self.groups[group_name]
+            geom = group.make_geom()
+            gnode =GeomNode('quad')
+            gnode.add_geom(geom)
+            size=base.get_size()
+            gnode.set_bounds(BoundingBox((0,0,0), (size[0], size[1], 1000)))
+            #gnode.set_bounds(OmniBoundingVolume())
+            node_path=self.gui_root.attach_new_node(gnode)
+            node_path.set_state(shaders.get_state(**self.shader_flags))
+            node_path.set_bin('fixed', self.group_order[group_name])
+            if group.instanced:
+                node_path.set_instance_count(group.capacity)
+            self.nodes[group_name]=node_path
+        self.redraw()
+
+    def save(self, path):
+        """Writes everything added to the gui (groups, data tables, ids and
+        widgets) to a single .bam file, see snapshot.save_snapshot().
+        The widgets are pickled, so their commands and callbacks must be
+        strings or module level functions (not lambdas or closures),
+        else pickle.PicklingError is raised naming the widget"""
+        snapshot.save_snapshot(self, path)
+
+    def load(self, path):
+        """Restores a file written by save() into this (empty) gui,
+        without making the widgets or adding the quads again"""
+        snapshot.load_snapshot(self, path)
+
+    def _make_mouse_buffer(self):
+        """Makes the 1x1 buffer that renders the gui under the mouse"""
+        self.mouse_tex=Texture()
+        self.mouse_buff=self._make_buffer("mouse_spy", (1,1), self.mouse_tex)
+        if self.pick_mode == 'gpu_async':
+            self.mouse_buff.add_render_texture(tex=self.pick_tex,
+                                               mode=GraphicsOutput.RTMTriggeredCopyRam,
+                                               bitplane=GraphicsOutput.RTPColor)
+        self.mouse_cam=base.make_camera(win=self.mouse_buff)
+        self.mouse_cam.reparent_to(self.gui_root)
+        self.mouse_cam.set_pos(0, 0, 100)
+        self.mouse_cam.set_p(-90)
+        lens = OrthographicLens()
+        lens.set_film_size(1, 1)
+        self.mouse_cam.node().set_lens(lens)
+        #shader for the mouse cam - ignored WFT?
+        #the idea was to render the gui using a shader that outputs the color_id
+        #so that we don't need a second render target
+        #but the camera just ignores the shader, no idea why
+        #state_node = NodePath(PandaNode("state_node"))
+        #state_node.set_shader(Shader.load(Shader.SL_GLSL, 'v.glsl', 'f.glsl'), 1)
+        #self.mouse_cam.node().set_initial_state(state_node.get_state())
 
     def _make_buffer(self, name, size=[512, 512], tex=None, aux_tex=None,
                     rgba_bits=(8, 8, 8, 8), clear_color=(0,0,0.0,0)):
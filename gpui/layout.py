@@ -0,0 +1,147 @@
+import hashlib
+import json
+import mmap
+import os
+import sys
+import numpy as np
+from panda3d.core import *
+
+from . import widgets
+from .snapshot import is_empty, get_state, set_state, dump_registry, load_registry
+
+__all__=['load_layout', 'build_layout', 'widget_types']
+
+#widget classes that can be used as "type" in a layout, add custom widgets here
+widget_types={name:getattr(widgets, name) for name in widgets.__all__}
+
+#change this when the cache format (or what the widgets store) changes
+CACHE_VERSION=6
+CACHE_MAGIC=b'GPUILAYT'
+#arrays in the cache file start at multiples of this
+CACHE_ALIGN=16
+
+def build_layout(gui, layout):
+    """Makes the widgets described by layout (a dict, as loaded from json):
+    {"groups": ["main"],
+     "widgets": [{"type": "Button", "name": "ok", "group": "main", "pos": [0, 32],
+                  "on_click_cmd": "print('ok')"},
+                 {"type": "MovableFrame", "name": "frame", "size": [256, 256],
+                  "children": [{"type": "Button", "pos": [0, 32]}]}]}
+    Each widget is a dict with the keyword arguments of the widget class,
+    "type" is a name from widget_types and "children" are widgets made
+    with this widget as their parent. Groups are made in the order given and
+    all groups made by the layout are closed at the end.
+    Returns a {name:widget} dict of the widgets that were made
+    """
+    old_groups=set(gui.groups)
+    for group_name in layout.get('groups', []):
+        if group_name not in gui.groups:
+            gui.make_group(group_name)
+    made={}
+    with gui.bulk():
+        for spec in layout.get('widgets', []):
+            _build_widget(gui, spec, None, made)
+    for group_name in gui.groups:
+        if group_name not in old_groups and group_name not in gui.nodes:
+            gui.close_group(group_name)
+    return made
+
+def _build_widget(gui, spec, parent, made):
+    kwargs=dict(spec)
+    type_name=kwargs.pop('type')
+    children=kwargs.pop('children', [])
+    if type_name not in widget_types:
+        raise ValueError('Unknown widget type in layout: {0}'.format(type_name))
+    if parent is not None:
+        kwargs.setdefault('parent', parent)
+    widget=widget_types[type_name](gui=gui, **kwargs)
+    name=getattr(widget, 'name', kwargs.get('name'))
+    if name is not None:
+        made[name]=widget
+    if children and name not in gui.elements:
+        raise ValueError('{0} widgets can not have children in a layout'.format(type_name))
+    for child in children:
+        _build_widget(gui, child, name, made)
+
+def load_layout(gui, path, cache_dir=None):
+    """Makes the widgets from a json layout file, see build_layout().
+    If cache_dir is given the result (vertex data, data tables, names and
+    pickled widgets) is written there in a binary file keyed by a hash
+    of the layout, texture atlas and window size. Later loads of the same layout
+    map that file and copy the arrays in place instead of making the widgets.
+    The cache is only used (and written) for a gui that has no elements yet,
+    it holds pickled objects, so only use cache files you made.
+    The widgets are pickled, so commands in the layout should be strings,
+    see snapshot.dump_registry().
+    Returns a {name:widget} dict of the widgets that were made
+    """
+    layout_data=VirtualFileSystem.get_global_ptr().read_file(Filename.from_os_specific(path), True)
+    use_cache=cache_dir is not None and is_empty(gui)
+    if use_cache:
+        cache_path=os.path.join(cache_dir, _get_cache_key(gui, layout_data)+'.gpuicache')
+        if os.path.exists(cache_path):
+            return _load_cache(gui, cache_path)
+    made=build_layout(gui, json.loads(layout_data))
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        _save_cache(gui, cache_path, made)
+    return made
+
+def _get_cache_key(gui, layout_data):
+    key=hashlib.sha1()
+    key.update('{0} {1} {2}'.format(CACHE_VERSION, sys.version, gui.win_size).encode())
+    key.update(str(gui._get_vertex_format()).encode())
+    key.update(layout_data)
+    atlas_path=gui.tex_atlas.get_fullpath()
+    if atlas_path:
+        key.update(VirtualFileSystem.get_global_ptr().read_file(atlas_path, True))
+    return key.hexdigest()
+
+def _save_cache(gui, path, made):
+    state, arrays=get_state(gui)
+    registry=dump_registry(gui, made=made)
+    blobs=[np.ascontiguousarray(array) for array in arrays.values()]+[registry]
+    offsets=[]
+    offset=0
+    for blob in blobs:
+        offsets.append(offset)
+        offset+=-(-memoryview(blob).nbytes//CACHE_ALIGN)*CACHE_ALIGN
+    header={'version':CACHE_VERSION,
+            'state':state,
+            'arrays':{name:(offset, array.dtype.str, array.shape) for (name, array), offset in zip(arrays.items(), offsets)},
+            'registry':(offsets[-1], len(registry))}
+    header_data=json.dumps(header).encode()
+    header_size=-(-(len(CACHE_MAGIC)+8+len(header_data))//CACHE_ALIGN)*CACHE_ALIGN
+    #write to a temp file first, so a half written file is never loaded
+    temp_path=path+'.tmp'
+    with open(temp_path, 'wb') as cache_file:
+        cache_file.write(CACHE_MAGIC)
+        cache_file.write(header_size.to_bytes(8, 'little'))
+        cache_file.write(header_data.ljust(header_size-len(CACHE_MAGIC)-8))
+        for blob, offset in zip(blobs, offsets):
+            cache_file.seek(header_size+offset)
+            cache_file.write(blob)
+    os.replace(temp_path, path)
+
+def _load_cache(gui, path):
+    with open(path, 'rb') as cache_file:
+        data=mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+    if data[:len(CACHE_MAGIC)] != CACHE_MAGIC:
+        raise ValueError('Not a gpui layout cache: {0}'.format(path))
+    header_size=int.from_bytes(data[len(CACHE_MAGIC):len(CACHE_MAGIC)+8], 'little')
+    header=json.loads(bytes(data[len(CACHE_MAGIC)+8:header_size]))
+    _restore_arrays(gui, data, header_size, header)
+    offset, size=header['registry']
+    start=header_size+offset
+    registry=load_registry(gui, data[start:start+size])
+    #no views of the file are left, the arrays were copied
+    data.close()
+    return registry['made']
+
+def _restore_arrays(gui, data, header_size, header):
+    """Copies the arrays from the mapped cache file into the gui and groups"""
+    arrays={}
+    for name, (offset, dtype, shape) in header['arrays'].items():
+        count=int(np.prod(shape))
+        arrays[name]=np.frombuffer(data, np.dtype(dtype), count, header_size+offset).reshape(shape)
+    set_state(gui, header['state'], arrays)
@@ -0,0 +1,127 @@
+import numpy as np
+
+__all__=['SpatialGrid']
+
+#cell range of ids that are in no cell
+NO_CELLS=(0, 0, -1, -1)
+#if more than this fraction of the ids move to other cells, all cells are made again
+REBUILD_FRACTION=0.25
+
+class SpatialGrid:
+    """A uniform grid of element rectangles (in gui pixels),
+    used to find the id under the mouse cursor on the CPU,
+    without rendering and reading back the mouse_tex.
+    If rectangles overlap the element with the highest layer wins,
+    the layer is the draw order of the element (see Gui.layers)
+    """
+    def __init__(self, cell_size=64):
+        self.cell_size=cell_size
+        self.cells={}
+        #rect, layer and the range of cells it covers for each id, indexed by id
+        self.rects=np.zeros((0, 4), dtype=np.float32)
+        self.layers=np.zeros(0, dtype=np.int64)
+        self.cell_ranges=np.zeros((0, 4), dtype=np.int64)
+
+    def _reserve(self, id):
+        if id >= len(self.rects):
+            size=max(64, len(self.rects)*2, id+1)
+            rects=np.zeros((size, 4), dtype=np.float32)
+            rects[:len(self.rects)]=self.rects
+            layers=np.zeros(size, dtype=np.int64)
+            layers[:len(self.layers)]=self.layers
+            cell_ranges=np.empty((size, 4), dtype=np.int64)
+            cell_ranges[:]=NO_CELLS
+            cell_ranges[:len(self.cell_ranges)]=self.cell_ranges
+            self.rects=rects
+            self.layers=layers
+            self.cell_ranges=cell_ranges
+
+    def update(self, id, rect, layer=None):
+        """Sets the rectangle (left, top, right, bottom) and layer of the id"""
+        self.update_many([id], [rect], None if layer is None else [layer])
+
+    def update_many(self, ids, rects, layers=None):
+        """Sets the rectangles (an array with a row for each id) of the ids,
+        layers is the draw order of each id, the ids themselves if not given.
+        Only ids that move to other cells are updated one by one,
+        unless there are many of them, then all the cells are made again"""
+        ids=np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        rects=np.array(rects, dtype=np.float32).reshape(-1, 4)
+        self._reserve(int(ids.max()))
+        self.layers[ids]=ids if layers is None else layers
+        empty=(rects[:, 0] >= rects[:, 2]) | (rects[:, 1] >= rects[:, 3])
+        rects[empty]=0.0
+        cell_ranges=np.floor_divide(rects, self.cell_size).astype(np.int64)
+        cell_ranges[empty]=NO_CELLS
+        old_ranges=self.cell_ranges[ids]
+        changed=np.nonzero(np.any(cell_ranges != old_ranges, axis=1))[0]
+        self.rects[ids]=rects
+        self.cell_ranges[ids]=cell_ranges
+        if len(changed) > REBUILD_FRACTION*len(self.rects):
+            self._rebuild()
+            return
+        for id, old_range, cell_range in zip(ids[changed].tolist(),
+                                             old_ranges[changed].tolist(),
+                                             cell_ranges[changed].tolist()):
+            self._remove_from_cells(id, old_range)
+            self._add_to_cells(id, cell_range)
+
+    def _rebuild(self):
+        """Makes all the cells from self.cell_ranges"""
+        ids=np.nonzero(self.cell_ranges[:, 0] <= self.cell_ranges[:, 2])[0]
+        if not len(ids):
+            self.cells={}
+            return
+        cell_ranges=self.cell_ranges[ids]
+        widths=cell_ranges[:, 2]-cell_ranges[:, 0]+1
+        counts=widths*(cell_ranges[:, 3]-cell_ranges[:, 1]+1)
+        #one entry for each cell of each id
+        index=np.arange(counts.sum())-np.repeat(np.cumsum(counts)-counts, counts)
+        widths=np.repeat(widths, counts)
+        x=np.repeat(cell_ranges[:, 0], counts)+index%widths
+        y=np.repeat(cell_ranges[:, 1], counts)+index//widths
+        ids=np.repeat(ids, counts)
+        order=np.lexsort((y, x))
+        x, y, ids=x[order], y[order], ids[order]
+        starts=np.flatnonzero(np.concatenate(([True], (x[1:] != x[:-1]) | (y[1:] != y[:-1]))))
+        ends=np.append(starts[1:], len(ids))
+        ids=ids.tolist()
+        self.cells={(cell_x, cell_y):set(ids[start:end]) for cell_x, cell_y, start, end
+                    in zip(x[starts].tolist(), y[starts].tolist(), starts.tolist(), ends.tolist())}
+
+    def remove(self, id):
+        self.update(id, (0, 0, 0, 0))
+
+    def _add_to_cells(self, id, cell_range):
+        for x in range(cell_range[0], cell_range[2]+1):
+            for y in range(cell_range[1], cell_range[3]+1):
+                cell=self.cells.get((x, y))
+                if cell is None:
+                    cell=self.cells[(x, y)]=set()
+                cell.add(id)
+
+    def _remove_from_cells(self, id, cell_range):
+        for x in range(cell_range[0], cell_range[2]+1):
+            for y in range(cell_range[1], cell_range[3]+1):
+                cell=self.cells[(x, y)]
+                cell.discard(id)
+                if not cell:
+                    del self.cells[(x, y)]
+
+    def query(self, x, y):
+        """Returns the top id at x, y or 0 if there is nothing there"""
+        cell=self.cells.get((int(x//self.cell_size), int(y//self.cell_size)))
+        if not cell:
+            return 0
+        top_id=0
+        top_layer=-1
+        for id in cell:
+            left, top, right, bottom=self.rects[id].tolist()
+            if left <= x < right and top <= y < bottom:
+                layer=int(self.layers[id])
+                if layer > top_layer:
+                    top_id=id
+                    top_layer=layer
+        return top_id
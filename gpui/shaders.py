@@ -1,71 +1,200 @@
 from collections import namedtuple
+from panda3d.core import Shader, RenderState, ShaderAttrib, TransparencyAttrib
 
+__all__=['widget', 'get_shader', 'get_state']
 
 ShaderText = namedtuple('ShaderText', 'vertex, fragment')
 
+#compiled shaders and render states, shared by all groups of all guis
+_shaders={}
+_states={}
+
+def _add_defines(text, defines):
+    version, body=text.split('\n', 1)
+    return '\n'.join([version]+['#define {0} 1'.format(name) for name in defines]+[body])
+
+def get_shader(clipping=True, hover=True, text=True, mouse_spy=False, instanced=False):
+    """Returns the widget shader with the given features enabled,
+    each variant is only made once.
+    With mouse_spy the hovered id is read from the mouse_tex (rendered by
+    the mouse spy buffer), else it is the hover_id input.
+    instanced is for the vertex format of InstancedQuadGroup """
+    key=(clipping, hover, text, mouse_spy, instanced)
+    if key not in _shaders:
+        defines=[]
+        if clipping:
+            defines.append('CLIPPING')
+        if hover:
+            defines.append('HOVER')
+        if text:
+            defines.append('TEXT')
+        if mouse_spy:
+            defines.append('MOUSE_SPY')
+        if instanced:
+            defines.append('INSTANCED')
+        _shaders[key]=Shader.make(Shader.SL_GLSL,
+                                  _add_defines(widget.vertex, defines),
+                                  _add_defines(widget.fragment, defines))
+    return _shaders[key]
+
+def get_state(clipping=True, hover=True, text=True, mouse_spy=False, instanced=False):
+    """Returns the RenderState (shader and transparency) for group nodes"""
+    key=(clipping, hover, text, mouse_spy, instanced)
+    if key not in _states:
+        _states[key]=RenderState.make(ShaderAttrib.make(get_shader(clipping, hover, text, mouse_spy, instanced)),
+                                      TransparencyAttrib.make(TransparencyAttrib.M_alpha),
+                                      1)
+    return _states[key]
+
 widget=ShaderText(
 '''#version 130
 in vec4 p3d_Vertex;
+#ifdef INSTANCED
+//one record for each quad (instance): pos and size, uv rect, id and mode
+//p3d_Vertex is a corner of the unit quad shared by all instances
+in vec4 quad;
+in vec4 uv_rect;
+in vec2 id_mode;
+in vec2 slice;
+#else
 in vec2 p3d_MultiTexCoord0;
 in vec4 color_id;
+in vec4 slice;
+#endif
 in vec4 offset_uv;
 
 uniform mat4 p3d_ModelViewProjectionMatrix;
 uniform sampler2D pos_scale;
 uniform sampler2D clips;
+uniform ivec2 table_size;
 
 out vec2 uv;
 out vec4 uv_offset;
 flat out vec4 vtx_color_id;
 flat out vec4 clip;
+flat out float mode;
+out vec2 gui_pos;
+//nine-slice: border and size of the quad and the pos in the quad (in pixels)
+flat out vec4 vtx_slice;
+out vec2 slice_pos;
 
 void main()
     {
-    int id =int(color_id.w);
-    vec4 pos_scale= texelFetch(pos_scale, ivec2(mod(id, 128), 127-(id/128)), 0);
-    clip = texelFetch(clips, ivec2(mod(id, 128), 127-(id/128)), 0);
-
+#ifdef INSTANCED
+    float quad_id=id_mode.x;
+    //the quad mode, 0 - widget, 1 - text glyph, 2 - nine-slice
+    mode=id_mode.y;
+    vec4 vert=vec4(quad.xy+p3d_Vertex.xy*quad.zw, 0.0, 1.0);
+    uv=vec2(mix(uv_rect.x, uv_rect.z, p3d_Vertex.x), mix(uv_rect.w, uv_rect.y, p3d_Vertex.y));
+    if (mode > 1.5)
+        uv=uv_rect.xw;
+    vtx_slice=vec4(slice, quad.zw);
+    slice_pos=p3d_Vertex.xy*quad.zw;
+    //the id as a rgb color (like color_id in the vertex format) and the id as w
+    vtx_color_id=vec4(floor(quad_id/65536.0), mod(floor(quad_id/256.0), 256.0), mod(quad_id, 256.0), 0.0)/255.0;
+    vtx_color_id.w=quad_id;
+#else
+    float quad_id=color_id.w;
+    //z is the quad mode, 0 - widget, 1 - text glyph, 2 - nine-slice
+    mode=p3d_Vertex.z;
     vec4 vert = p3d_Vertex;
+    vert.z=0.0;
+    uv=p3d_MultiTexCoord0;
+    vtx_color_id=color_id;
+    vtx_slice=slice;
+    //4 vertices for each quad, in the order: top left, bottom left, top right, bottom right
+    slice_pos=vec2(float(gl_VertexID%4 > 1), float(gl_VertexID%2))*slice.zw;
+#endif
+    int id =int(quad_id);
+    //the tables are stored as bgra, one row per table_size.x ids
+    ivec2 table_uv=ivec2(id % table_size.x, id / table_size.x);
+    vec4 pos_scale= texelFetch(pos_scale, table_uv, 0).bgra;
+    clip = texelFetch(clips, table_uv, 0).bgra;
+
     vert.xy*=pos_scale.zw;
     vert.xy+=pos_scale.xy;
+    gui_pos=vert.xy;
 
     gl_Position = p3d_ModelViewProjectionMatrix * vert;
-    uv=p3d_MultiTexCoord0;
-    vtx_color_id=color_id;
+    //hidden or clipped away, move all the vertices of the quad to one point off screen
+    if (clip.x >= clip.z || clip.y >= clip.w)
+        gl_Position=vec4(2.0, 2.0, 2.0, 1.0);
     uv_offset=offset_uv;
     }
 ''',
 '''#version 130
+#ifdef MOUSE_SPY
 uniform sampler2D mouse_tex;
+#else
+uniform float hover_id;
+#endif
 uniform sampler2D atlas;
+uniform sampler2D font;
 uniform float click;
 
 in vec2 uv;
 in vec4 uv_offset;
 flat in vec4 vtx_color_id;
 flat in vec4 clip;
+flat in float mode;
+in vec2 gui_pos;
+flat in vec4 vtx_slice;
+in vec2 slice_pos;
+
+//nine-slice, uv is the top left corner of the tiles in the atlas:
+//the corner and edge tiles (border pixels) followed by the middle tile,
+//the right and bottom ones are mirrored and the middle tile is repeated
+vec2 get_slice_uv(vec2 uv, vec2 pos, vec4 slice)
+    {
+    vec2 border=slice.xy;
+    vec2 size=slice.zw;
+    vec2 tile_pos=border+mod(pos-border, border);
+    tile_pos=mix(tile_pos, size-pos, greaterThan(pos, size-border));
+    tile_pos=mix(tile_pos, pos, lessThan(pos, border));
+    return uv+vec2(tile_pos.x, -tile_pos.y)/vec2(textureSize(atlas, 0));
+    }
 
 void main()
     {
     vec4 color_id=vtx_color_id;
     color_id.w=1.0;
 
-    //clip from bottom
-    //if (gl_FragCoord.y < clip.y)
-    //    discard;
-    //clip from top
-    //if (gl_FragCoord.y > clip.x)
-    //    discard;
-
-    vec4 mouse_color=texture(mouse_tex, vec2(0.5, 0.5));
-    vec2 final_uv=uv;
+#ifdef CLIPPING
+    //clip rect in gui pixels: left, top, right, bottom
+    //tested first, so clipped fragments don't sample any textures
+    if (any(lessThan(gui_pos, clip.xy)) || any(greaterThanEqual(gui_pos, clip.zw)))
+        discard;
+#endif
 
-    if (distance(vtx_color_id.rgb, mouse_color.rgb)<0.0001)
+    vec4 final_color;
+#ifdef TEXT
+    if (mode > 0.5 && mode < 1.5)
+        {
+        //signed distance field glyph, the edge is at 0.5, uv_offset is the tint
+        float dist=texture(font, uv).a;
+        float edge=max(fwidth(dist), 0.001);
+        final_color=vec4(uv_offset.rgb, uv_offset.a*smoothstep(0.5-edge, 0.5+edge, dist));
+        }
+    else
+#endif
         {
-        final_uv.xy-=uv_offset.xy*(1.0-click);
-        final_uv.xy-=uv_offset.zw*click;
+        vec2 final_uv=uv;
+        if (mode > 1.5)
+            final_uv=get_slice_uv(uv, slice_pos, vtx_slice);
+#ifdef HOVER
+#ifdef MOUSE_SPY
+        vec4 mouse_color=texture(mouse_tex, vec2(0.5, 0.5));
+        if (distance(vtx_color_id.rgb, mouse_color.rgb)<0.0001)
+#else
+        if (abs(vtx_color_id.w-hover_id)<0.5)
+#endif
+            {
+            final_uv.xy-=uv_offset.xy*(1.0-click);
+            final_uv.xy-=uv_offset.zw*click;
+            }
+#endif
+        final_color=texture(atlas, final_uv);
         }
-    vec4 final_color=texture(atlas, final_uv);
     color_id*=step(0.005,final_color.a);
     gl_FragData[0] =color_id;
     gl_FragData[1] =final_color;
@@ -0,0 +1,229 @@
+import copyreg
+import io
+import itertools
+import marshal
+import pickle
+from types import CodeType
+import numpy as np
+from panda3d.core import *
+
+from .widgets import Widget
+
+__all__=['save_snapshot', 'load_snapshot']
+
+#change this when the snapshot format (or what the widgets store) changes
+SNAPSHOT_VERSION=5
+
+def _reduce_code(code):
+    #compiled string commands, only load snapshots made with the same python
+    return marshal.loads, (marshal.dumps(code),)
+
+class RegistryPickler(pickle.Pickler):
+    """Pickles the widgets, the gui is stored as a reference"""
+    dispatch_table=copyreg.dispatch_table.copy()
+    dispatch_table[CodeType]=_reduce_code
+
+    def __init__(self, file, gui):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.gui=gui
+
+    def persistent_id(self, obj):
+        if obj is self.gui:
+            return 'gui'
+        return None
+
+class AttributePickler(RegistryPickler):
+    """Pickles one attribute of a widget, other widgets are left out
+    (they are checked on their own), see find_unpicklable()"""
+    def persistent_id(self, obj):
+        if obj is self.gui or isinstance(obj, Widget):
+            return 'gui'
+        return None
+
+class RegistryUnpickler(pickle.Unpickler):
+    """Unpickles the widgets, giving them the gui they are loaded into"""
+    def __init__(self, file, gui):
+        super().__init__(file)
+        self.gui=gui
+
+    def persistent_load(self, pid):
+        if pid == 'gui':
+            return self.gui
+        raise pickle.UnpicklingError('Unknown persistent id: {0}'.format(pid))
+
+def is_empty(gui):
+    """True if nothing was added to the gui yet"""
+    return not gui.elements and not gui.groups and gui.next_id == 1
+
+def find_unpicklable(gui):
+    """Returns (widget, attribute name) of the first widget attribute
+    that can't be pickled, or None"""
+    for widget in gui.elements.values():
+        for name, value in vars(widget).items():
+            try:
+                AttributePickler(io.BytesIO(), gui).dump(value)
+            except (pickle.PicklingError, AttributeError, TypeError):
+                return widget, name
+    return None
+
+def dump_registry(gui, **extra):
+    """Returns the widgets and commands of the gui (and any extra objects)
+    pickled as bytes. Commands and callbacks (eg. on_click_cmd, make_row)
+    must be strings or module level functions, lambdas and closures can't
+    be pickled, remove them before saving and set them again after loading"""
+    registry=dict(extra,
+                  font=gui.font,
+                  elements=gui.elements,
+                  click_commands=gui.click_commands,
+                  hold_commands=gui.hold_commands)
+    data=io.BytesIO()
+    try:
+        RegistryPickler(data, gui).dump(registry)
+    except (pickle.PicklingError, AttributeError, TypeError) as error:
+        unpicklable=find_unpicklable(gui)
+        if unpicklable is None:
+            raise
+        widget, name=unpicklable
+        raise pickle.PicklingError("Can't save widget '{0}' ({1}), its {2} ({3!r}) can't be pickled. "
+                                   "Use a string command or a module level function, or remove it "
+                                   "before saving and set it again after loading".format(
+                                       widget.name, type(widget).__name__, name, getattr(widget, name))) from error
+    return data.getvalue()
+
+def load_registry(gui, data):
+    """Adds the widgets and commands pickled by dump_registry() to the gui,
+    returns the unpickled dict"""
+    registry=RegistryUnpickler(io.BytesIO(data), gui).load()
+    gui.elements.update(registry['elements'])
+    gui.click_commands.update(registry['click_commands'])
+    gui.hold_commands.update(registry['hold_commands'])
+    if registry['font'] is not None and gui.font is None:
+        gui.set_font(registry['font'])
+    return registry
+
+def get_state(gui):
+    """Returns the state of the gui as a (json friendly) dict
+    and a dict of arrays, see set_state()"""
+    if gui.hierarchy_dirty:
+        gui.resolve_hierarchy()
+    num_ids=gui.next_id
+    arrays={'pos_scale':gui.pos_scale.data[:num_ids],
+            'clips':gui.clips.data[:num_ids],
+            'bounds':gui.bounds[:num_ids],
+            'parents':gui.parents[:num_ids],
+            'local_pos':gui.local_pos[:num_ids],
+            'local_clips':gui.local_clips[:num_ids],
+            'visible':gui.visible[:num_ids],
+            'free_ids':np.array(sorted(gui.free_ids), dtype=np.int64)}
+    for group_name, group in gui.groups.items():
+        arrays['rows:'+group_name]=group.get_rows()[:group.num_slots*group.rows_per_slot]
+        arrays['owners:'+group_name]=group.get_owners()
+    name_counter=next(gui.name_counter)
+    gui.name_counter=itertools.count(name_counter)
+    state={'next_id':num_ids,
+           'instanced':gui.instanced,
+           'name_counter':name_counter,
+           'element_id':gui.element_id,
+           'groups':list(gui.groups)}
+    return state, arrays
+
+def set_state(gui, state, arrays):
+    """Restores the state from get_state() into an empty gui,
+    the arrays are copied so they can be views of a file"""
+    num_ids=state['next_id']
+    gui.next_id=num_ids
+    gui._reserve_tables(num_ids-1)
+    gui.pos_scale.data[:num_ids]=arrays['pos_scale']
+    gui.pos_scale.mark(np.arange(num_ids))
+    gui.clips.data[:num_ids]=arrays['clips']
+    gui.clips.mark(np.arange(num_ids))
+    gui.bounds[:num_ids]=arrays['bounds']
+    gui.parents[:num_ids]=arrays['parents']
+    gui.local_pos[:num_ids]=arrays['local_pos']
+    gui.local_clips[:num_ids]=arrays['local_clips']
+    gui.visible[:num_ids]=arrays['visible']
+    gui.clips_used=bool(np.any(gui.clips.data[:num_ids] != gui.clips.default)) or not gui.visible[:num_ids].all()
+    gui.free_ids=arrays['free_ids'].tolist()
+    gui.hierarchy_order=None
+    gui.hierarchy_dirty=True
+    for group_name in state['groups']:
+        gui.make_group(group_name)
+        group=gui.groups[group_name]
+        group.set_quads(arrays['rows:'+group_name], arrays['owners:'+group_name])
+        for slot, id in group.slot_owner.items():
+            gui.element_quads.setdefault(id, []).append((group_name, slot))
+            gui.layers[id]=max(gui.layers[id], gui._get_layers(group_name, slot))
+        gui.close_group(group_name)
+    gui.dirty_pick.update(gui.element_quads)
+    gui.element_id.update(state['element_id'])
+    gui.name_counter=itertools.count(state['name_counter'])
+
+def save_snapshot(gui, path):
+    """Writes the gui to a .bam file: a node for each group (with its geom),
+    the pos_scale and clips textures and the rest of the state
+    (ids, hierarchy and pickled widgets) in the image of a 'saved' texture.
+    Raises pickle.PicklingError if a widget has a command that can't be
+    pickled (a lambda or closure), see dump_registry() """
+    state, arrays=get_state(gui)
+    root=NodePath('gpui_snapshot')
+    groups=root.attach_new_node('groups')
+    for group_name in state['groups']:
+        group=gui.groups[group_name]
+        geom=Geom(group.vdata)
+        if group.tris is not None:
+            geom.add_primitive(group.tris)
+        gnode=GeomNode(group_name)
+        gnode.add_geom(geom)
+        groups.attach_new_node(gnode)
+    for table in (gui.pos_scale, gui.clips):
+        root.attach_new_node(table.name).set_texture(table.tex)
+    extra={name:arrays[name] for name in ('bounds', 'parents', 'local_pos', 'local_clips', 'visible', 'free_ids')}
+    for group_name in state['groups']:
+        extra['owners:'+group_name]=arrays['owners:'+group_name]
+    saved={'state':state,
+           'arrays':extra,
+           'registry':dump_registry(gui)}
+    #tags are too small for this, so it's stored as the image of a texture
+    saved_tex=Texture('saved')
+    saved_data=pickle.dumps(saved, pickle.HIGHEST_PROTOCOL)
+    saved_tex.setup_1d_texture(len(saved_data), Texture.T_unsigned_byte, Texture.F_luminance)
+    saved_tex.set_ram_image(saved_data)
+    root.attach_new_node('saved').set_texture(saved_tex)
+    root.set_tag('gpui_snapshot', str(SNAPSHOT_VERSION))
+    if not root.write_bam_file(Filename.from_os_specific(path)):
+        raise IOError('Could not write gui snapshot: {0}'.format(path))
+
+def load_snapshot(gui, path):
+    """Restores a gui written by save_snapshot() into an empty gui,
+    no widgets are constructed and no quads are added one by one.
+    The snapshot holds pickled objects, so only load files you made"""
+    if not is_empty(gui):
+        raise ValueError('A snapshot can only be loaded into an empty gui')
+    #read the bam file directly, the model loader may change the vertex format
+    bam_file=BamFile()
+    if not bam_file.open_read(Filename.from_os_specific(path)):
+        raise IOError('Could not read gui snapshot: {0}'.format(path))
+    root=NodePath(bam_file.read_node())
+    bam_file.close()
+    version=root.get_tag('gpui_snapshot')
+    if version != str(SNAPSHOT_VERSION):
+        raise ValueError('Unsupported gui snapshot version: {0}'.format(version))
+    saved=pickle.loads(root.find('saved').get_texture().get_ram_image().get_data())
+    state=saved['state']
+    if state['instanced'] != gui.instanced:
+        raise ValueError('The gui snapshot was saved with instanced={0}'.format(state['instanced']))
+    num_ids=state['next_id']
+    arrays=dict(saved['arrays'])
+    for table_name in ('pos_scale', 'clips'):
+        tex=root.find(table_name).get_texture()
+        data=np.frombuffer(memoryview(tex.get_ram_image()), dtype=np.float32)
+        arrays[table_name]=data.reshape(-1, 4)[:num_ids]
+    for group_name in state['groups']:
+        vdata=root.find('groups/'+group_name).node().get_geom(0).get_vertex_data()
+        quad_array=vdata.get_array(gui.group_type.quad_array)
+        num_rows=len(arrays['owners:'+group_name])*gui.group_type.rows_per_slot
+        rows=np.frombuffer(memoryview(quad_array.get_handle().get_data()), dtype=np.float32)
+        arrays['rows:'+group_name]=rows.reshape(quad_array.get_num_rows(), -1)[:num_rows]
+    set_state(gui, state, arrays)
+    load_registry(gui, saved['registry'])
+    root.remove_node()
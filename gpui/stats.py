@@ -0,0 +1,62 @@
+import time
+from contextlib import contextmanager
+from panda3d.core import PStatCollector
+
+__all__=['GuiStats']
+
+class GuiStats:
+    """Timers and counters for the hot paths of the gui.
+    Timers show up in PStats as 'Gui:<name>' collectors and counters as
+    'Gui <name>' levels, they are also kept in python:
+    self.frame has the values of the current frame so far (ended by Gui.update_stats()),
+    self.last_frame the values of the last finished one, eg.
+    gui.stats.last_frame['update_ms'] or gui.stats.last_frame['uploaded_bytes']
+    """
+    timer_names=('update', 'upload', 'pick', 'commands', 'groups')
+    #marked_ids - ids marked as changed in the data tables
+    #uploaded_bytes - size of the data table textures sent to the gpu
+    #allocated_quads - quads owned by elements in the closed groups,
+    #                  drawn or not (hidden, clipped, frames with no redraw)
+    #groups - closed groups, redraw - 1 if the gui was drawn this frame
+    counter_names=('marked_ids', 'uploaded_bytes', 'allocated_quads', 'groups', 'redraw')
+
+    def __init__(self):
+        self.collectors={name:PStatCollector('Gui:'+name.capitalize()) for name in self.timer_names}
+        self.levels={name:PStatCollector('Gui '+name.replace('_', ' ')) for name in self.counter_names}
+        self.frame=self._new_frame()
+        self.last_frame=self._new_frame()
+
+    def _new_frame(self):
+        frame=dict.fromkeys(self.counter_names, 0)
+        frame.update(dict.fromkeys((name+'_ms' for name in self.timer_names), 0.0))
+        return frame
+
+    @contextmanager
+    def timer(self, name):
+        """Times the code in the context, eg:
+        with gui.stats.timer('update'):
+            ...
+        """
+        collector=self.collectors[name]
+        collector.start()
+        start=time.perf_counter()
+        try:
+            yield
+        finally:
+            self.frame[name+'_ms']+=(time.perf_counter()-start)*1000.0
+            collector.stop()
+
+    def add(self, name, value):
+        """Adds value to the counter"""
+        self.frame[name]+=value
+
+    def set(self, name, value):
+        """Sets the counter to value"""
+        self.frame[name]=value
+
+    def end_frame(self):
+        """Sends the counters to PStats and starts a new frame"""
+        for name, collector in self.levels.items():
+            collector.set_level(self.frame[name])
+        self.last_frame=self.frame
+        self.frame=self._new_frame()
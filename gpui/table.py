@@ -0,0 +1,79 @@
+import numpy as np
+from panda3d.core import *
+
+__all__=['DataTable']
+
+class DataTable:
+    """A table of 4 floats for each element id, stored in a float texture.
+    self.data is a numpy array (one row per id) that is a zero-copy view of
+    the ram image of self.tex, writing to it changes what the shader sees,
+    only mark() the changed ids and call upload() once per frame.
+    The 4 values are stored in the order they are given, in the texture they
+    end up as bgra so the shader needs to read them as texelFetch(...).bgra
+    """
+    def __init__(self, name, default=(0.0, 0.0, 0.0, 0.0), size=(128, 128)):
+        self.name=name
+        self.default=default
+        self.width=size[0]
+        self.height=size[1]
+        self.dirty=False
+        #number of ids marked since the last upload
+        self.num_marked=0
+        self.tex=Texture(name)
+        self.tex.setup_2d_texture(self.width, self.height, Texture.T_float, Texture.F_rgba32)
+        self.tex.set_wrap_u(Texture.WM_clamp)
+        self.tex.set_wrap_v(Texture.WM_clamp)
+        self.tex.set_magfilter(SamplerState.FT_nearest)
+        self.tex.set_minfilter(SamplerState.FT_nearest)
+        self.data=self._view()
+        self.data[:]=default
+
+    def _view(self):
+        ram=memoryview(self.tex.modify_ram_image())
+        return np.frombuffer(ram, dtype=np.float32).reshape(-1, 4)
+
+    def grow(self, height):
+        """Makes the table (and texture) taller, keeping the current data """
+        if height <= self.height:
+            return
+        old_data=self.data.copy()
+        self.height=height
+        self.tex.setup_2d_texture(self.width, self.height, Texture.T_float, Texture.F_rgba32)
+        self.data=self._view()
+        self.data[:len(old_data)]=old_data
+        self.data[len(old_data):]=self.default
+        self.dirty=True
+
+    def reserve(self, id):
+        """Grows the table (doubling the height) until the id fits """
+        if id >= len(self.data):
+            height=self.height
+            while id >= height*self.width:
+                height*=2
+            self.grow(height)
+
+    def reset(self, ids):
+        """Sets the id (or array of ids) back to the default value """
+        self.data[ids]=self.default
+        self.mark(ids)
+
+    def mark(self, ids):
+        """Marks the given id (or array of ids) as changed """
+        self.dirty=True
+        self.num_marked+=1 if np.ndim(ids) == 0 else len(ids)
+
+    def fill(self, value):
+        self.data[:]=value
+        self.dirty=True
+
+    def upload(self):
+        """Sends the data to the texture if anything changed,
+        returns the number of bytes uploaded, always the whole texture
+        (Panda uploads all of the ram image when it is modified) """
+        self.num_marked=0
+        if not self.dirty:
+            return 0
+        self.dirty=False
+        #marks the ram image as modified, the data is already in place
+        self.tex.modify_ram_image()
+        return self.width*self.height*16
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+from panda3d.core import *
+
+__all__=['Font']
+
+#printable ascii
+DEFAULT_CHARS=''.join(chr(i) for i in range(32, 127))
+#change this when the cache format changes
+FONT_CACHE_VERSION=1
+#quad mode (vertex.z) of glyph quads, see shaders.widget
+GLYPH_MODE=1
+
+class Font:
+    """A signed distance field glyph atlas made from a font file (eg. .ttf),
+    glyph quads use the same vertex format and shader as the widgets
+    so text is drawn in the same geoms (see Gui.set_font()).
+    Only the glyphs in chars are in the atlas, others are drawn as '?'.
+    size is the size (in gui pixels) of one font unit at text_scale 1.0
+    If cache_dir is given the atlas is written there (as a .txo texture and
+    a .json with the glyph metrics) and loaded from there next time
+    """
+    def __init__(self, path, chars=DEFAULT_CHARS, size=16, pixels_per_unit=32,
+                 page_size=(512, 512), cache_dir=None):
+        self.path=path
+        self.chars=chars
+        self.size=size
+        self.pixels_per_unit=pixels_per_unit
+        self.page_size=tuple(page_size)
+        self.cache_dir=cache_dir
+        #char -> (left, bottom, right, top, u_left, v_bottom, u_right, v_top, advance)
+        self.glyphs={}
+        self.line_height=1.0
+        #top of the highest glyph, above the baseline
+        self.ascent=0.0
+        self.tex=None
+        cache_path=None
+        if cache_dir is not None:
+            cache_path=os.path.join(cache_dir, self._get_cache_key())
+            if os.path.exists(cache_path+'.json') and os.path.exists(cache_path+'.txo'):
+                self._load(cache_path)
+                return
+        self._build()
+        if cache_path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._save(cache_path)
+
+    def __reduce__(self):
+        #widgets keep their font, pickled widgets load it again (from the cache)
+        return (Font, (self.path, self.chars, self.size, self.pixels_per_unit, self.page_size, self.cache_dir))
+
+    def _get_cache_key(self):
+        key=hashlib.sha1()
+        key.update('{0} {1} {2} {3}'.format(FONT_CACHE_VERSION, self.chars, self.pixels_per_unit, self.page_size).encode())
+        key.update(VirtualFileSystem.get_global_ptr().read_file(Filename.from_os_specific(self.path), True))
+        return key.hexdigest()
+
+    def _build(self):
+        font=DynamicTextFont(Filename.from_os_specific(self.path))
+        if not font.is_valid():
+            raise IOError('Could not load font: {0}'.format(self.path))
+        font.set_render_mode(TextFont.RM_distance_field)
+        font.set_pixels_per_unit(self.pixels_per_unit)
+        font.set_page_size(*self.page_size)
+        dimensions=LVecBase4()
+        texcoords=LVecBase4()
+        for char in self.chars:
+            glyph=font.get_glyph(ord(char))
+            if glyph is None:
+                continue
+            if glyph.get_quad(dimensions, texcoords):
+                self.glyphs[char]=tuple(dimensions)+tuple(texcoords)+(glyph.get_advance(),)
+            else:
+                self.glyphs[char]=(0.0,)*8+(glyph.get_advance(),)
+            self.ascent=max(self.ascent, dimensions[3])
+        if font.get_num_pages() != 1:
+            raise ValueError('The glyphs do not fit on one page, use a bigger page_size or fewer chars')
+        self.line_height=font.get_line_height()
+        page=font.get_page(0)
+        self.tex=Texture('font')
+        self.tex.setup_2d_texture(page.get_x_size(), page.get_y_size(), page.get_component_type(), page.get_format())
+        self.tex.set_ram_image(page.get_ram_image())
+        self._setup_tex()
+
+    def _setup_tex(self):
+        self.tex.set_wrap_u(Texture.WM_clamp)
+        self.tex.set_wrap_v(Texture.WM_clamp)
+        self.tex.set_magfilter(SamplerState.FT_linear)
+        self.tex.set_minfilter(SamplerState.FT_linear)
+
+    def _save(self, cache_path):
+        with open(cache_path+'.json', 'w') as metrics_file:
+            json.dump({'glyphs':self.glyphs,
+                       'line_height':self.line_height,
+                       'ascent':self.ascent}, metrics_file)
+        self.tex.write(Filename.from_os_specific(cache_path+'.txo'))
+
+    def _load(self, cache_path):
+        with open(cache_path+'.json') as metrics_file:
+            metrics=json.load(metrics_file)
+        self.glyphs={char:tuple(glyph) for char, glyph in metrics['glyphs'].items()}
+        self.line_height=metrics['line_height']
+        self.ascent=metrics['ascent']
+        self.tex=Texture('font')
+        if not self.tex.read(Filename.from_os_specific(cache_path+'.txo')):
+            raise IOError('Could not read font cache: {0}'.format(cache_path))
+        self._setup_tex()
+
+    def get_glyph(self, char):
+        """Returns the metrics of the char, see self.glyphs"""
+        glyph=self.glyphs.get(char)
+        if glyph is None:
+            glyph=self.glyphs.get('?', (0.0,)*9)
+        return glyph
+
+    def get_text_size(self, txt, text_scale=1.0):
+        """Returns the (width, height) of the text in gui pixels"""
+        scale=self.size*text_scale
+        lines=txt.split('\n')
+        width=max(sum(self.get_glyph(char)[8] for char in line) for line in lines)
+        return (width*scale, len(lines)*self.line_height*scale)
+
+    def make_quads(self, txt, text_scale=1.0, color=(1.0, 1.0, 1.0, 1.0), pos=(0, 0)):
+        """Returns a list of glyph quads (dicts of arguments for Gui.add_quad())
+        with the text starting at pos (top left corner), in gui pixels.
+        Whitespace has no quads."""
+        scale=self.size*text_scale
+        quads=[]
+        x=0.0
+        baseline=self.ascent*scale
+        for char in txt:
+            if char == '\n':
+                x=0.0
+                baseline+=self.line_height*scale
+                continue
+            left, bottom, right, top, u_left, v_bottom, u_right, v_top, advance=self.get_glyph(char)
+            if right > left:
+                quads.append({'size':((right-left)*scale, (top-bottom)*scale),
+                              'pos':(pos[0]+x+left*scale, pos[1]+baseline-top*scale),
+                              'uv':(u_left, v_bottom, u_right, v_top),
+                              'tint':color,
+                              'mode':GLYPH_MODE})
+            x+=advance*scale
+        return quads
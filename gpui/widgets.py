@@ -1,114 +1,174 @@
+import math
 import traceback
+from functools import lru_cache
+import numpy as np
 from panda3d.core import *
+from .text import GLYPH_MODE
+from .group import SLICE_MODE
 
 __all__=['Button', 'Dummy', 'Frame','MovableFrame', 'InputField',
- 'MultilineInputField','ScrolledArea', 'Text','StaticText', 'Thumb', 'Slider']
+ 'MultilineInputField','ScrolledArea', 'ScrollBar', 'Text','StaticText', 'Thumb', 'Slider']
 
 class Widget:
     """Base class for most other widgets,
     This class implements:
     -creating geoms from a list of quads
     -set_pos, set_pos_delta that will also move child widgets
-    -show/hide (not yet)
-    -clip planes (not yet!)
+     (the pos of a child is relative to its parent, resolved by the gui)
+    -show/hide, hidden widgets hide their children too
+    -clip rects, children are clipped by the clips of all their parents
+    -destroy, the quads and id are reused by new widgets
     """
     def __init__(self, gui, name=None, parent=None, group=None, quads=[], pos=None, *args, **kwargs):
         self.gui=gui
         if name is None:
-            name='widget_'+str(self.gui.next_id)
+            name=self.gui.new_name()
         self.name=name
         self.parent=parent
         self.children=[]
         self.id=self.gui.get_id(name)
         self.gui.elements[name]=self
         self.clip=False
-        if group is None:
-            if self.gui.groups:
-                group_name=None
-                for name in self.gui.groups:
-                    if name not in self.gui.nodes:
-                        group_name=name
-                        break
-                if group_name:
-                    group=group_name
-                else:
-                    group_name = 'group_0'
-                    i=0
-                    while group_name in self.gui.groups:
-                        i+=1
-                        group_name = 'group_'+str(i)
-                    self.gui.make_group(group_name)
-                    group=group_name
-            else:
-                self.gui.make_group('group_0')
-                group= 'group_0'
-        elif group not in self.gui.groups:
-            self.gui.make_group(group)
+        if quads:
+            group=self._get_group(group)
+        #name of the group with the quads of this widget
+        self.group=group
         for quad in quads:
             self.gui.add_quad(group_name=group, id=self.id, **quad)
         if parent in self.gui.elements:
             self.gui.elements[parent].children.append(name)
-            self.set_pos(*self.gui.elements[parent].get_pos())
+            self.gui.set_parent(self.id, self.gui.elements[parent].id)
         if pos is not None:
             self.set_pos(*pos)
         #pass on init...
         super().__init__(*args, **kwargs)
 
+    def _get_group(self, group):
+        """Returns the name of the group to use, makes the group if needed"""
+        if group is None:
+            if self.gui.groups:
+                #closed groups can still take new quads, use the last one made
+                group=list(self.gui.groups)[-1]
+            else:
+                self.gui.make_group('group_0')
+                group= 'group_0'
+        elif group not in self.gui.groups:
+            self.gui.make_group(group)
+        return group
+
+    @classmethod
+    def make_grid(cls, *, gui, columns, rows, spacing=(32, 32), pos=(0, 0), name=None, **kwargs):
+        """Makes columns*rows widgets of this class in a grid (eg. a grid of buttons),
+        the quads of all of them are written at once (see Gui.bulk()).
+        kwargs are passed on to each widget, names are name_column_row """
+        widgets=[]
+        with gui.bulk():
+            for row in range(rows):
+                for column in range(columns):
+                    widget_name=None
+                    if name is not None:
+                        widget_name='{0}_{1}_{2}'.format(name, column, row)
+                    widget_pos=(pos[0]+column*spacing[0], pos[1]+row*spacing[1])
+                    widgets.append(cls(gui=gui, name=widget_name, pos=widget_pos, **kwargs))
+        return widgets
+
+    @classmethod
+    def make_column(cls, *, gui, count, spacing=32, pos=(0, 0), name=None, **kwargs):
+        """Makes a list of count widgets of this class, one below the other"""
+        return cls.make_grid(gui=gui, columns=1, rows=count, spacing=(0, spacing), pos=pos, name=name, **kwargs)
+
     def set_pos(self, x,y):
-        if self.parent in self.gui.elements:
-            parent_pos=self.gui.elements[self.parent].get_pos()
-            x+=parent_pos[0]
-            y+=parent_pos[1]
+        """Sets the pos relative to the parent"""
         self.gui.set_pos_scale(id=self.id, x=x, y=y)
-        delta=Vec2(x,y)-self.get_pos()
-        for name in self.children:
-            self.gui.elements[name].set_pos_delta(*delta)
 
     def get_pos(self):
+        """Returns the pos relative to the gui"""
         pos_scale=self.gui.get_pos_scale(self.id)
         return Vec2(pos_scale[0],pos_scale[1])
 
     def set_pos_delta(self, x=None, y=None):
         self.gui.set_delta_pos(id=self.id, x=x, y=y)
-        for name in self.children:
-            self.gui.elements[name].set_pos_delta(x, y)
+
+    def destroy(self):
+        """Removes the widget and all its children from the gui"""
+        for name in list(self.children):
+            if name in self.gui.elements:
+                self.gui.elements[name].destroy()
+        if self.parent in self.gui.elements:
+            self.gui.elements[self.parent].children.remove(self.name)
+        self.gui.remove_quads(self.id)
+        del self.gui.elements[self.name]
+        self.gui.release_id(self.name)
 
     def hide(self):
-        pass
+        """Hides the widget and all its children"""
+        self.gui.set_visible(self.id, False)
 
     def show(self):
-        pass
+        """Shows the widget again, children that were hidden on their own stay hidden"""
+        self.gui.set_visible(self.id, True)
 
-    def set_clip(self, top, bottom, left, right):
-        pass
+    def is_hidden(self):
+        return not self.gui.is_visible(self.id)
+
+    def set_clip(self, *, left, top, right, bottom):
+        """Clips the widget and its children to the rect (relative to the widget pos)"""
+        self.clip=(left, top, right, bottom)
+        self.gui.set_clip(self.id, left=left, top=top, right=right, bottom=bottom)
+
+    def clear_clip(self):
+        self.clip=False
+        self.gui.clear_clip(self.id)
+
+@lru_cache(maxsize=None)
+def compile_command(cmd):
+    """Compiles a command string, the same string is only compiled once"""
+    return compile(cmd, '<command>', 'exec')
+
+def print_command_error(cmd, err):
+    trbck=traceback.format_exception_only(err.__class__, err)[0]
+    print('ERROR: Could not run command:\n{0}\n{1}'.format(cmd, trbck))
 
 class Clickable:
     """This class implements the clickable interface,
-    classes that inherit from it will exec the on_click_cmd string when clicked
+    classes that inherit from it will call on_click_cmd(*on_click_args) when clicked,
+    on_click_cmd can also be a string, compiled once and exec'ed on click
     """
-    def __init__(self, on_click_cmd=None, *args, **kwargs ):
+    def __init__(self, on_click_cmd=None, on_click_args=(), *args, **kwargs ):
         #pass on init...
         super().__init__(*args, **kwargs)
-        self.on_click_cmd=on_click_cmd
+        self.set_click_command(on_click_cmd, *on_click_args)
         self.gui.click_commands[self.id]=self.on_click
 
+    def set_click_command(self, cmd, *args):
+        self.on_click_cmd=cmd
+        self.on_click_args=args
+        self.on_click_code=None
+        if isinstance(cmd, str):
+            self.on_click_code=compile_command(cmd)
+
     def on_click(self):
+        if self.on_click_cmd is None:
+            return
         try:
-            exec(self.on_click_cmd)
+            if self.on_click_code is not None:
+                exec(self.on_click_code)
+            else:
+                self.on_click_cmd(*self.on_click_args)
         except Exception as err:
-            trbck=traceback.format_exception_only(err.__class__, err)[0]
-            print('ERROR: Could not run command:\n{0}\n{1}'.format(self.on_click_cmd, trbck))
+            print_command_error(self.on_click_cmd, err)
 
 class Movable:
     """This class implements moving/dragging widgets with the mouse,
     classes the inherit from it can be moved with the mouse (hold and drag)
     x_limit and y_limit are the right-left or top-bottom limits in pixels
     eg. x_limit=(0, 128) will allow the widget to move up to 128 pixels right (from its initial pos)
-    on_move_cmd will exec each frame
+    on_move_cmd(*on_move_args) will be called each frame the widget moves,
+    (or exec'ed if it's a string, compiled once)
     if limits are set self.value can be used to get the current value in 0.0-1.0 scale or
     self.total_delta can be used to get the values in pixels
     """
-    def __init__(self, x_limit=None, y_limit=None, on_move_cmd=None, *args, **kwargs ):
+    def __init__(self, x_limit=None, y_limit=None, on_move_cmd=None, on_move_args=(), *args, **kwargs ):
         #pass on init...
         super().__init__(*args, **kwargs)
         self.gui.hold_commands[self.id]=self.on_move
@@ -121,9 +181,16 @@ class Movable:
         if y_limit:
             self.y_range=max(1, y_limit[1]-y_limit[0])
         self.total_delta=Vec2(0,0)
-        self.on_move_cmd=on_move_cmd
+        self.set_move_command(on_move_cmd, *on_move_args)
         self.value=(0,0)
 
+    def set_move_command(self, cmd, *args):
+        self.on_move_cmd=cmd
+        self.on_move_args=args
+        self.on_move_code=None
+        if isinstance(cmd, str):
+            self.on_move_code=compile_command(cmd)
+
     def on_move(self, delta):
         delta.x=int(round(delta.x))
         delta.y=int(round(delta.y))
@@ -142,64 +209,227 @@ class Movable:
                    self.total_delta[1]/self.y_range)
         if self.on_move_cmd is not None:
             try:
-                exec(self.on_move_cmd)
+                if self.on_move_code is not None:
+                    exec(self.on_move_code)
+                else:
+                    self.on_move_cmd(*self.on_move_args)
             except Exception as err:
-                trbck=traceback.format_exception_only(err.__class__, err)[0]
-                print('ERROR: Could not run command:\n{0}\n{1}'.format(self.on_move_cmd, trbck))
-class Dummy:
-    """A Dummy widget is a widget that has no visible elements"""
-    def __init__(self, *, gui=None, parent=None, pos=None):
-        self.gui=gui
-        if name is None:
-            name='widget_'+str(self.gui.next_id)
-        self.name=name
-        self.parent=parent
-        self.children=[]
-        self.id=self.gui.get_id(name)
-        self.gui.elements[name]=self
-        if parent in self.gui.elements:
-            self.gui.elements[parent].children.append(name)
-            self.set_pos(*self.gui.elements[parent].get_pos())
-        self.pos=Vec2(*pos)
+                print_command_error(self.on_move_cmd, err)
+class Dummy(Widget):
+    """A Dummy widget is a widget that has no visible elements,
+    it can be used as a parent to move other widgets around"""
+    def __init__(self, *, gui=None, name=None, parent=None, pos=None):
+        super().__init__(gui=gui, name=name, parent=parent, pos=pos)
 
-    def set_pos(self, x, y):
-        if self.parent in self.gui.elements:
-            parent_pos=self.gui.elements[self.parent].get_pos()
-            x+=parent_pos[0]
-            y+=parent_pos[1]
-        delta=Vec2(x,y)-self.pos
-        self.pos=Vec2(x,y)
-        for name in self.children:
-            self.gui.elements[name].set_pos_delta(*delta)
+def get_font(gui, font):
+    """Returns the font of the gui, font can only be None or that font
+    (the shader samples glyphs from the atlas of the gui font)"""
+    if gui.font is None:
+        raise ValueError('No font for the text, use Gui.set_font() first')
+    if font is not None and font is not gui.font:
+        raise ValueError('Text can only use the font set with Gui.set_font()')
+    return gui.font
 
-    def get_pos(self):
-        return self.pos
+class StaticText(Widget):
+    """StaticText is a type of text that can NOT be changed after creation (can only be moved, scaled,etc)
+    The glyphs are quads in a group like any other widget (see Font),
+    font must be the font set with Gui.set_font() (the default)"""
+    def __init__(self, *, gui=None, parent=None, group=None, name=None, txt='', font=None, text_scale=1.0,
+                 color=(1.0, 1.0, 1.0, 1.0), pos=None):
+        quads=get_font(gui, font).make_quads(txt, text_scale, color)
+        super().__init__(gui=gui, name=name, parent=parent, group=group, quads=quads, pos=pos)
 
-    def set_pos_delta(self, x=0, y=0):
-        self.pos+=Vec2(x,y)
-        for name in self.children:
-            self.gui.elements[name].set_pos_delta(x, y)
+class Text(Widget):
+    """This type of text can be changed with set_text(),
+    the glyphs are quads in a group, just like StaticText.
+    Each Text keeps a pool of glyph slots (at least capacity),
+    on change only the glyphs that differ are written again and unused
+    slots are collapsed to zero-area quads, the pool grows if needed"""
+    def __init__(self, *, gui=None, parent=None, group=None, name=None, txt='', font=None, text_scale=1.0,
+                 color=(1.0, 1.0, 1.0, 1.0), pos=None, capacity=16):
+        self.font=get_font(gui, font)
+        self.text_scale=text_scale
+        self.color=color
+        self.txt=None
+        #slots of the pool (in the order of glyphs) and the glyph quad in each
+        self.slots=[]
+        self.quads=[]
+        super().__init__(gui=gui, name=name, parent=parent, group=group, pos=pos)
+        self.group=self._get_group(group)
+        self._grow(capacity)
+        self.set_text(txt)
 
-class StaticText:
-    """StaticText is a type of text that can NOT be changed after creation (can only be moved, scaled,etc) """
-    def __init__(self, *, gui=None, parent=None, name=None, txt='', font=None, text_scale=1.0, pos=None):
-        pass
+    def _grow(self, capacity):
+        """Adds zero-area quads to the pool, so it has at least capacity slots"""
+        num_slots=len(self.gui.element_quads.get(self.id, []))
+        num_new=max(capacity, num_slots*2)-num_slots
+        self.gui.add_quads(self.group, [self.id]*num_new, size=0, pos=(0, 0), uv=(0, 0, 0, 0), mode=GLYPH_MODE)
+
+    def set_text(self, txt):
+        """Changes the text, only the glyphs that changed are written again"""
+        if txt == self.txt:
+            return
+        self.txt=txt
+        quads=self.font.make_quads(txt, self.text_scale, self.color)
+        slots=[slot for group, slot in self.gui.element_quads[self.id]]
+        if len(quads) > len(slots):
+            self._grow(len(quads))
+            slots=[slot for group, slot in self.gui.element_quads[self.id]]
+        if slots != self.slots:
+            #new slots (or moved by Gui.compact_group), write all
+            self.slots=slots
+            self.quads=[False]*len(slots)
+        quads+=[None]*(len(slots)-len(quads))
+        changed=[i for i, quad in enumerate(quads) if quad != self.quads[i]]
+        if changed:
+            zero={'size':(0, 0), 'pos':(0, 0), 'uv':(0, 0, 0, 0), 'tint':(0, 0, 0, 0)}
+            new_quads=[quads[i] or zero for i in changed]
+            tint=[quad['tint'] for quad in new_quads]
+            self.gui.write_quads(self.group,
+                                 [slots[i] for i in changed],
+                                 self.id,
+                                 size=[quad['size'] for quad in new_quads],
+                                 pos=[quad['pos'] for quad in new_quads],
+                                 uv=[quad['uv'] for quad in new_quads],
+                                 hover_uv=[color[0:2] for color in tint],
+                                 click_uv=[color[2:4] for color in tint],
+                                 mode=GLYPH_MODE)
+            for i in changed:
+                self.quads[i]=quads[i]
+        #bounds for picking
+        used=[quad for quad in quads if quad is not None]
+        if used:
+            self.gui.set_bounds(self.id,
+                                min(quad['pos'][0] for quad in used),
+                                min(quad['pos'][1] for quad in used),
+                                max(quad['pos'][0]+quad['size'][0] for quad in used),
+                                max(quad['pos'][1]+quad['size'][1] for quad in used))
+        else:
+            self.gui.set_bounds(self.id, np.inf, np.inf, -np.inf, -np.inf)
 
-class Text:
-    """This type of text can be changed.
-    Uses TextNode internally.
-    Each instance is a new geom so use wisely!
+class ScrolledArea(Widget):
+    """A viewport of size pixels that scrolls its content up and down,
+    widgets parented to self.content are scrolled (inner_size is the size of that content).
+    For long lists use num_items, make_row and bind_row, only the rows in view
+    (and overscan rows above and below) are made:
+    make_row(gui, parent) returns a new row widget made with the given parent,
+    bind_row(row, index) is called when a row starts showing the item at index,
+    rows that scroll out of view are reused for the items that scroll into view.
+    Everything is clipped to the viewport.
     """
-    def __init__(self, *, gui=None, parent=None, name=None, txt='', font=None, text_scale=1.0, pos=None):
-        pass
+    def __init__(self, *, gui=None, parent=None, group=None, name=None, size=(128, 128), inner_size=(128, 256), pos=None,
+                 num_items=0, row_height=32, make_row=None, bind_row=None, overscan=2, scroll_bar=True):
+        super().__init__(gui=gui, name=name, parent=parent, pos=pos)
+        self.size=size
+        self.inner_size=inner_size
+        self.row_height=row_height
+        self.make_row=make_row
+        self.bind_row=bind_row
+        self.overscan=overscan
+        self.scroll_y=0.0
+        #content and rows are children of the viewport, clipped by it
+        self.viewport=Dummy(gui=gui, name=self.name+'_viewport', parent=self.name)
+        self.viewport.set_clip(left=0, top=0, right=size[0], bottom=size[1])
+        self.content=Dummy(gui=gui, name=self.name+'_content', parent=self.viewport.name)
+        #row widgets and the index of the item each one shows (-1 for none)
+        self.rows=[]
+        self.row_items=[]
+        self.num_items=0
+        self.scroll_bar=None
+        if scroll_bar:
+            self.scroll_bar=ScrollBar(gui=gui, name=self.name+'_scroll_bar', parent=self.name, group=group,
+                                      height=size[1], pos=(size[0], 0), on_scroll_cmd=self.on_scroll_bar)
+        self.set_num_items(num_items)
 
-class ScrolledArea:
-    """ """
-    def __init__(self, *, gui=None, parent=None, name=None, size=(128, 128), inner_size=(128, 256), pos=None):
-        pass
+    def get_inner_height(self):
+        if self.make_row is not None:
+            return self.num_items*self.row_height
+        return self.inner_size[1]
 
-class ScrollBar:
-    """ Scroll bar for ScrolledArea"""
+    def get_max_scroll(self):
+        return max(0.0, self.get_inner_height()-self.size[1])
+
+    def set_num_items(self, num_items):
+        """Sets the number of items in the list, all the rows are bound again"""
+        self.num_items=num_items
+        if self.make_row is not None:
+            num_rows=min(num_items, math.ceil(self.size[1]/self.row_height)+1+2*self.overscan)
+            if num_rows > len(self.rows):
+                with self.gui.bulk():
+                    for i in range(num_rows-len(self.rows)):
+                        self.rows.append(self.make_row(self.gui, self.viewport.name))
+            self.row_items=[-1]*len(self.rows)
+            self.gui.set_visible_many([row.id for row in self.rows], False)
+        self.scroll_to(self.scroll_y)
+
+    def scroll_to(self, y):
+        """Scrolls so the content at y (pixels from the top) is at the top of the viewport"""
+        self._scroll(y)
+        if self.scroll_bar is not None:
+            max_scroll=self.get_max_scroll()
+            self.scroll_bar.set_fraction(self.scroll_y/max_scroll if max_scroll else 0.0)
+
+    def scroll_by(self, delta):
+        self.scroll_to(self.scroll_y+delta)
+
+    def on_scroll_bar(self, fraction):
+        self._scroll(fraction*self.get_max_scroll())
+
+    def _scroll(self, y):
+        self.scroll_y=min(max(0.0, y), self.get_max_scroll())
+        self.content.set_pos(0, -self.scroll_y)
+        if self.rows:
+            self._update_rows()
+
+    def _update_rows(self):
+        """Binds the rows to the items in view and moves them into place"""
+        num_rows=len(self.rows)
+        first=max(0, int(self.scroll_y//self.row_height)-self.overscan)
+        last=min(self.num_items, first+num_rows)
+        first=max(0, last-num_rows)
+        in_view=set(range(first, last))
+        free_rows=[i for i, index in enumerate(self.row_items) if index not in in_view]
+        in_view.difference_update(self.row_items)
+        for index in sorted(in_view):
+            i=free_rows.pop()
+            if self.row_items[i] == -1:
+                self.rows[i].show()
+            self.row_items[i]=index
+            self.bind_row(self.rows[i], index)
+        for i in free_rows:
+            if self.row_items[i] != -1:
+                self.row_items[i]=-1
+                #nothing to show
+                self.rows[i].hide()
+        #positions are relative to the viewport, so very long lists keep their float precision
+        xy=[(0.0, index*self.row_height-self.scroll_y) for index in self.row_items]
+        self.gui.set_pos_scale_many([row.id for row in self.rows], xy=xy)
+
+class ScrollBar(Widget):
+    """ Vertical scroll bar (for ScrolledArea),
+    on_scroll_cmd(fraction) is called when the thumb is moved, fraction is 0.0-1.0"""
+    def __init__(self, *, gui=None, parent=None, group=None, name=None, height=128, pos=None, on_scroll_cmd=None):
+        quads=[{'size':(16, height), 'pos':(8, 0), 'uv':(0.1875, 0.75,  0.25, 0.8125)}]
+        super().__init__(gui=gui, name=name, parent=parent, group=group, quads=quads, pos=pos)
+        self.on_scroll_cmd=on_scroll_cmd
+        self.thumb=Thumb(gui=gui,
+                         x_limit=(0, 0),
+                         y_limit=(0, max(0, height-32)),
+                         name=self.name+'_thumb',
+                         parent=self.name,
+                         group=self.group,
+                         on_move_cmd=self.on_thumb_move)
+
+    def on_thumb_move(self):
+        if self.on_scroll_cmd is not None:
+            self.on_scroll_cmd(self.thumb.value[1])
+
+    def set_fraction(self, fraction):
+        """Moves the thumb, without calling on_scroll_cmd"""
+        y=round(fraction*self.thumb.y_range)
+        self.thumb.total_delta=Vec2(0, y)
+        self.thumb.value=(0.0, y/self.thumb.y_range)
+        self.thumb.set_pos(0, y)
 
 class InputField:
     """A user input widget - I have no idea how to make it work """
@@ -212,32 +442,9 @@ class MultilineInputField:
         pass
 
 class Frame(Widget):
-    """A non-interactive frame """
+    """A non-interactive frame, any size (one nine-slice quad) """
     def __init__(self, *, gui=None, parent=None, group=None, name=None, size=(128, 128), pos=None, **kwargs):
-        quads=[]
-        num_rows=size[0]//64
-        num_columns=size[1]//64
-        for row in range(num_rows):
-            for column in range(num_columns):
-                if row == 0 and column == 0: #top left
-                    quads.append({'size':64, 'pos':(0,0), 'uv':(0.25, 0.875, 0.375, 1.0)})
-                elif row == 0 and column == (num_columns-1):  #top right
-                    quads.append({'size':64, 'pos':(64*column,0), 'uv':(0.375, 0.875, 0.25, 1.0)})
-                elif row == (num_rows-1) and column == 0:  #bottom left
-                    quads.append({'size':64, 'pos':(0,64*row), 'uv':(0.25, 1.0, 0.375, 0.875)})
-                elif row == (num_rows-1) and column == (num_columns -1):  #bottom right
-                    quads.append({'size':64, 'pos':(64*column,64*row), 'uv':(0.375, 1.0, 0.25, 0.875)})
-                elif row == 0: #top
-                    quads.append({'size':64, 'pos':(64*column,64*row), 'uv':(0.375, 0.875, 0.5, 1.0)})
-                elif row == (num_rows-1): #bottom
-                    quads.append({'size':64, 'pos':(64*column,64*row), 'uv':(0.375, 1.0, 0.5, 0.875)})
-                elif column == 0: #left
-                    quads.append({'size':64, 'pos':(64*column,64*row), 'uv':(0.25, 0.75, 0.375, 0.875)})
-                elif column == (num_columns -1): #right
-                    quads.append({'size':64, 'pos':(64*column,64*row), 'uv':(0.375, 0.75, 0.25, 0.875)})
-                else:
-                    quads.append({'size':64, 'pos':(64*column,64*row), 'uv':(0.375, 0.75, 0.5, 0.875)})
-
+        quads=[{'size':size, 'pos':(0,0), 'uv':(0.25, 0.75, 0.5, 1.0), 'border':(64, 64), 'mode':SLICE_MODE}]
         #init base class
         super().__init__(gui=gui, name=name, parent=parent, group=group, pos=pos, quads=quads, **kwargs)
 
@@ -247,47 +454,51 @@ class MovableFrame(Frame, Movable):
         super().__init__(gui=gui, parent=parent, group=group, name=name, size=size, pos=pos,**kwargs)
 
 class Slider:
-    """Horizontal slider """
-    def __init__(self, *, gui=None, parent=None, group=None, name=None, width=64, pos=None, on_move_cmd=None):
-        #rail
-        #left end cap
-        quads=[{'size':32, 'pos':(0,0), 'uv':(0.125, 0.75,  0.1875, 0.8125)}]
-        end_cap_offset=32
-        if width > 32:
-            for i in range((width-32)//32):
-                quads.append({'size':32, 'pos':(32+i*32,0), 'uv':(0.1875, 0.75,  0.25, 0.8125)})
-                end_cap_offset+=32
-        #right end cap
-        quads.append({'size':32, 'pos':(end_cap_offset,0), 'uv':(0.1875, 0.75,  0.125, 0.8125)})
-        self.rail=Widget(gui=gui, name=name+'_rail', parent=name, group=group, pos=pos, quads=quads)
+    """Horizontal slider, the thumb is a child of the rail and the rail a child of parent """
+    def __init__(self, *, gui=None, parent=None, group=None, name=None, width=64, pos=None, on_move_cmd=None, on_move_args=()):
+        if name is None:
+            name=gui.new_name()
+        self.name=name
+        #rail, end caps with the middle repeated between them (one nine-slice quad)
+        quads=[{'size':(max(width, 32)+32, 32), 'pos':(0,0), 'uv':(0.125, 0.75,  0.25, 0.8125),
+                'border':(32, 32), 'mode':SLICE_MODE}]
+        self.rail=Widget(gui=gui, name=name+'_rail', parent=parent, group=group, pos=pos, quads=quads)
         self.thumb=Thumb(gui=gui,
                          x_limit=(0, width),
                          y_limit=(0,0),
                          name=name+'_thumb',
-                         parent=name,
-                         group=group,
-                         pos=pos,
-                         on_move_cmd=on_move_cmd)
+                         parent=self.rail.name,
+                         group=self.rail.group,
+                         on_move_cmd=on_move_cmd,
+                         on_move_args=on_move_args)
+
+    def destroy(self):
+        self.thumb.destroy()
+        self.rail.destroy()
 
 class Thumb(Widget, Movable):
     """Thumb for sliders and scroll bars """
-    def __init__(self, *, gui, x_limit=None, y_limit=None, name=None, parent=None, group=None, pos=None, on_move_cmd=None):
+    def __init__(self, *, gui, x_limit=None, y_limit=None, name=None, parent=None, group=None, pos=None, on_move_cmd=None, on_move_args=()):
         quads=[{'size':32, 'pos':(0,0), 'uv':(0.125, 0.9375,  0.1875, 1.0), 'hover_uv':(0, 0.0625), 'click_uv':(0, 0.125)}]
-        super().__init__(gui=gui, name=name, parent=parent, group=group, quads=quads, pos=pos, x_limit=x_limit, y_limit=y_limit, on_move_cmd=on_move_cmd)
+        super().__init__(gui=gui, name=name, parent=parent, group=group, quads=quads, pos=pos, x_limit=x_limit, y_limit=y_limit, on_move_cmd=on_move_cmd, on_move_args=on_move_args)
 
 class Button(Widget, Clickable):
-    """ A button, will exec on_click_cmd when clicked"""
+    """ A button, will call (or exec) on_click_cmd when clicked,
+    txt is a label drawn (centered) in the same group as the button,
+    txt_props are keyword arguments for it: font, text_scale, color """
     def __init__(self, *, gui, width=32, pos=None, txt=None, txt_props=None,
-                 name=None, parent=None, group=None, on_click_cmd=None):
-        #left end cap
-        quads=[{'size':32, 'pos':(0,0), 'uv':(0, 0.9375,  0.0625, 1.0), 'hover_uv':(0, 0.0625), 'click_uv':(0, 0.125)}]
-        end_cap_offset=32
-        if width > 32:
-            for i in range((width-32)//32):
-                quads.append({'size':32, 'pos':(32+i*32,0), 'uv':(0.0625, 0.9375,  0.125, 1.0), 'hover_uv':(0, 0.0625), 'click_uv':(0, 0.125)})
-                end_cap_offset+=32
-        #right end cap
-        quads.append({'size':32, 'pos':(end_cap_offset,0), 'uv':(0.0625, 0.9375,  0.0, 1.0), 'hover_uv':(0, 0.0625), 'click_uv':(0, 0.125)})
+                 name=None, parent=None, group=None, on_click_cmd=None, on_click_args=()):
+        #end caps with the middle repeated between them (one nine-slice quad), any width
+        full_width=max(width, 32)+32
+        quads=[{'size':(full_width, 32), 'pos':(0,0), 'uv':(0, 0.9375,  0.125, 1.0), 'border':(32, 32),
+                'mode':SLICE_MODE, 'hover_uv':(0, 0.0625), 'click_uv':(0, 0.125)}]
+        #label
+        if txt:
+            txt_props=dict(txt_props or {})
+            font=get_font(gui, txt_props.pop('font', None))
+            text_scale=txt_props.get('text_scale', 1.0)
+            text_size=font.get_text_size(txt, text_scale)
+            quads+=font.make_quads(txt, pos=((full_width-text_size[0])/2, (32-text_size[1])/2), **txt_props)
         #init base class
-        super().__init__(gui=gui, name=name, parent=parent, group=group, quads=quads, pos=pos, on_click_cmd=on_click_cmd)
+        super().__init__(gui=gui, name=name, parent=parent, group=group, quads=quads, pos=pos, on_click_cmd=on_click_cmd, on_click_args=on_click_args)
 
@@ -20,9 +20,8 @@ class App(DirectObject):
         #make some sample data
         self.gui.make_group('test')
         #stress test, make 1000 buttons - may not fit screen
-        for x in range(50):
-            for y in range(20):
-                Button(gui=self.gui, width=32, group='test', pos=(-16+x*32, y*32), on_click_cmd='print("button id:{0} clicked!".format(self.id))')
+        Button.make_grid(gui=self.gui, columns=50, rows=20, spacing=(32, 32), pos=(-16, 0),
+                         width=32, group='test', on_click_cmd='print("button id:{0} clicked!".format(self.id))')
 
         self.gui.close_group('test')
 
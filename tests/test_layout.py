@@ -0,0 +1,38 @@
+import os
+import pytest
+from panda3d.core import *
+
+load_prc_file_data('', 'window-type offscreen\naudio-library-name null\nmodel-path {0}'.format(
+                   os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from direct.showbase.ShowBase import ShowBase
+from gpui import Gui, build_layout
+
+@pytest.fixture(scope='module')
+def base():
+    showbase=ShowBase()
+    yield showbase
+    showbase.destroy()
+
+@pytest.fixture
+def gui(base):
+    return Gui(pick_mode='cpu')
+
+def test_nested_slider_moves_with_frame(gui):
+    layout={'groups':['main'],
+            'widgets':[{'type':'MovableFrame', 'name':'frame', 'group':'main', 'size':[256, 256], 'pos':[200, 50],
+                        'children':[{'type':'Slider', 'name':'slider', 'width':128, 'pos':[10, 100]}]}]}
+    made=build_layout(gui, layout)
+    gui.resolve_hierarchy()
+    assert made['slider'].rail.get_pos() == Vec2(210, 150)
+    assert made['slider'].thumb.get_pos() == Vec2(210, 150)
+    made['frame'].set_pos_delta(20, 5)
+    gui.resolve_hierarchy()
+    assert made['slider'].rail.get_pos() == Vec2(230, 155)
+    assert made['slider'].thumb.get_pos() == Vec2(230, 155)
+
+def test_children_of_a_slider(gui):
+    layout={'widgets':[{'type':'Slider', 'name':'slider',
+                        'children':[{'type':'Button', 'name':'ok'}]}]}
+    with pytest.raises(ValueError):
+        build_layout(gui, layout)